@@ -0,0 +1,36 @@
+# src/ticket_check_batch.py
+from nada_dsl import *
+
+
+@nada_fn
+def difference(a: SecretInteger, b: SecretInteger) -> SecretInteger:
+    return a - b
+
+
+@nada_fn
+def total(a: SecretInteger, b: SecretInteger) -> SecretInteger:
+    return a + b
+
+
+def ticket_check_batch(width):
+    """ticket_check over `width` slots, with every input and the status held in arrays"""
+    user = Party(name="User")
+    issuer = Party(name="Issuer")
+
+    # User inputs, one element per slot
+    user_tickets = Array(SecretInteger(Input(name="user_tickets", party=user)), size=width)
+    user_wallets = Array(SecretInteger(Input(name="user_wallets", party=user)), size=width)
+    user_redeems = Array(SecretInteger(Input(name="user_redeems", party=user)), size=width)
+    # Issuer confirms ticket details, one element per slot
+    ticket_ids = Array(SecretInteger(Input(name="ticket_ids", party=issuer)), size=width)
+    ticket_owners = Array(SecretInteger(Input(name="ticket_owners", party=issuer)), size=width)
+    is_redeemed = Array(SecretInteger(Input(name="is_redeemed", party=issuer)), size=width)
+
+    # Same status as ticket_check, slot by slot
+    ticket_diffs = user_tickets.zip(ticket_ids).map(difference)
+    owner_diffs = user_wallets.zip(ticket_owners).map(difference)
+    statuses = ticket_diffs.zip(owner_diffs).map(total)
+    statuses = statuses.zip(is_redeemed).map(total)
+    statuses = statuses.zip(user_redeems).map(total)
+
+    return [Output(statuses, "statuses", party=issuer)]
@@ -0,0 +1,6 @@
+# src/ticket_check_batch_32.py
+from ticket_check_batch import ticket_check_batch
+
+
+def nada_main():
+    return ticket_check_batch(32)
@@ -1,34 +1,10 @@
 import asyncio
-import os
 import argparse
-from dataclasses import dataclass
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
+from program_registry import deployed_program_id, record_program
 
 
 def parse_args(args=None):
@@ -59,10 +35,7 @@ def parse_args(args=None):
 class TicketStorage:
     def __init__(self, config: NillionConfig, ticket_id, ticket_owner, is_redeemed):
         self.config = config
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
         self.user_id = self.client.user_id
         self.program_path = f"../nada_programs/target/{config.program_name}.nada.bin"
         self.ticket_id = ticket_id
@@ -70,16 +43,16 @@ class TicketStorage:
         self.is_redeemed = is_redeemed
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
+        return create_payments(self.config)
 
     async def store_program(self, payments_client, payments_wallet):
         print("-----STORE PROGRAM")
+        # Skip quote, payment and upload when this exact binary is already on the cluster
+        program_id = deployed_program_id(self.program_path, self.config.cluster_id, self.user_id)
+        if program_id is not None:
+            print("Program already stored. program_id:", program_id)
+            return program_id
+
         receipt = await get_quote_and_pay(
             self.client,
             nillion.Operation.store_program(self.program_path),
@@ -98,6 +71,7 @@ class TicketStorage:
         program_id = f"{self.user_id}/{self.config.program_name}"
         print("Stored program. action_id:", action_id)
         print("Stored program_id:", program_id)
+        record_program(self.program_path, self.config.cluster_id, self.user_id, program_id)
         return program_id
 
     async def store_secrets(self, program_id, payments_client, payments_wallet):
@@ -158,8 +132,3 @@ async def main(args=None):
 
 if __name__ == "__main__":
     asyncio.run(main())
-
-
-@pytest.mark.asyncio
-async def test_main():
-    pass
\ No newline at end of file
@@ -1,34 +1,9 @@
 import asyncio
-import os
 import argparse
-from dataclasses import dataclass
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
 
 
 class TicketRedemption:
@@ -36,23 +11,14 @@ class TicketRedemption:
         self.config = config
         self.user_ticket = int(user_ticket)
         self.user_wallet = int(user_wallet)
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
         self.user_id = self.client.user_id
         self.party_id = self.client.party_id
         self.store_ids = []
         self.party_ids = []
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
+        return create_payments(self.config)
 
     async def store_user_secrets(self, issuer_user_id: str, payments_client, payments_wallet):
         program_id = f"{issuer_user_id}/{self.config.program_name}"
@@ -153,8 +119,3 @@ async def main(args=None):
 
 if __name__ == "__main__":
     asyncio.run(main())
-
-
-@pytest.mark.asyncio
-async def test_main():
-    pass
\ No newline at end of file
@@ -1,56 +1,23 @@
 import asyncio
-import os
 import argparse
-from dataclasses import dataclass
 from typing import Dict, List
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+import nillion_config
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
 
 
 class TicketComputation:
     def __init__(self, config: NillionConfig):
         self.config = config
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
         self.user_id = self.client.user_id
         self.party_id = self.client.party_id
         self.program_id = f"{self.user_id}/{config.program_name}"
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
+        return create_payments(self.config)
 
     def parse_party_store_ids(self, party_store_pairs: List[str]) -> Dict[str, str]:
         party_store_mapping = {}
@@ -103,7 +70,7 @@ class TicketComputation:
     async def wait_for_result(self):
         while True:
             compute_event = await self.client.next_compute_event()
-            if isinstance(compute_event, nillion.ComputeFinishedEvent):
+            if nillion_config.network.compute_finished(compute_event):
                 print(f"✅  Compute complete for compute_id {compute_event.uuid}")
                 print(f"🖥️  The result is {compute_event.result.value}")
                 return compute_event.result.value
@@ -0,0 +1,48 @@
+import os
+from quart import Quart, Response, jsonify, request
+
+import ticket_api
+from metrics import metrics
+from ticket_service import TicketService
+
+# Same /api routes as flask_app (both serve ticket_api), but handlers await the Nillion coroutines on the server's
+# own event loop, so in-flight requests do not each hold a worker thread.
+# Run with: hypercorn async_app:app --bind 0.0.0.0:5001
+app = Quart(__name__)
+
+if os.getenv("NILLION_FAKE_CLUSTER"):
+    # Offline mode for load tests: an in-memory stand-in for the devnet and nilchain
+    import fake_nillion
+    fake_nillion.install()
+service = TicketService()
+
+
+@app.before_serving
+async def start_service():
+    await service.start()
+
+
+@app.after_serving
+async def close_service():
+    await service.close()
+
+
+def view(route):
+    async def handle(**params):
+        data = await request.get_json(silent=True) if request.method == 'POST' else None
+        body, status = await ticket_api.respond(route, service, data, **params)
+        return jsonify(body), status
+    return handle
+
+
+for route in ticket_api.ROUTES:
+    app.add_url_rule(route.rule, route.endpoint, view(route), methods=route.methods)
+
+
+@app.route('/metrics', methods=['GET'])
+async def scrape_metrics():
+    # Rendered only when scraped; recording a stage is a couple of counter updates
+    return Response(metrics.render(service.stats()), mimetype='text/plain; version=0.0.4')
+
+if __name__ == '__main__':
+    app.run(port=5001)
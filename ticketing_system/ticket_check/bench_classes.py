@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+
+import fake_nillion
+from client_registry import registry
+
+# Class-level benchmarks run against the in-memory cluster, so they measure client-side cost only
+fake_nillion.install()
+
+from nillion_config import NillionConfig  # noqa: E402
+from ticket_storage import TicketStorage  # noqa: E402
+from ticket_redemption import TicketRedemption  # noqa: E402
+from ticket_computation import TicketComputation  # noqa: E402
+
+BENCHMARKS = (
+    'parse_party_store_ids',
+    'setup_compute_bindings',
+    'store_secrets',
+    'store_user_secrets',
+    'perform_computation',
+)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks for TicketStorage, TicketRedemption and TicketComputation against a fake cluster"
+    )
+    parser.add_argument("--iterations", type=int, default=200, help="Timed runs per benchmark and mode")
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=BENCHMARKS,
+        default=list(BENCHMARKS),
+        help="Benchmarks to run",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default="bench_baseline.json",
+        help="JSON file of earlier medians to compare against",
+    )
+    parser.add_argument("--save_baseline", action="store_true", help="Write this run's medians to --baseline")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Flag a regression when a median is this fraction slower than the baseline",
+    )
+    parser.add_argument("--output", type=str, default=None, help="Write the full results as JSON to this file")
+    return parser.parse_args(args)
+
+
+class Fixture:
+    """Program, issuer store and user store that the timed operations refer to"""
+
+    async def setup(self):
+        self.config = NillionConfig.from_env()
+        storage = TicketStorage(self.config, 1, 2, 0)
+        self.program_id = await storage.store_program(None, None)
+        self.issuer_user_id = storage.user_id
+        self.store_id = await storage.store_secrets(self.program_id, None, None)
+        _, self.party_store_pair = await TicketRedemption(self.config, 1, 2).store_user_secrets(
+            self.issuer_user_id, None, None
+        )
+
+    async def parse_party_store_ids(self):
+        TicketComputation(self.config).parse_party_store_ids([self.party_store_pair])
+
+    async def setup_compute_bindings(self):
+        computation = TicketComputation(self.config)
+        computation.setup_compute_bindings([self.party_store_pair.split(":")[0]])
+
+    async def store_secrets(self):
+        await TicketStorage(self.config, 1, 2, 0).store_secrets(self.program_id, None, None)
+
+    async def store_user_secrets(self):
+        await TicketRedemption(self.config, 1, 2).store_user_secrets(self.issuer_user_id, None, None)
+
+    async def perform_computation(self):
+        computation = TicketComputation(self.config)
+        await computation.perform_computation(
+            self.store_id,
+            computation.parse_party_store_ids([self.party_store_pair]),
+            None,
+            None
+        )
+
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        'median_us': statistics.median(samples) * 1e6,
+        'mean_us': statistics.fmean(samples) * 1e6,
+        'p95_us': samples[int(0.95 * (len(samples) - 1))] * 1e6,
+        'min_us': samples[0] * 1e6,
+    }
+
+
+async def run_benchmark(operation, iterations, cold):
+    """Time `operation` including class construction; cold runs drop cached clients before each call"""
+    samples = []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        await operation()
+        for _ in range(iterations):
+            if cold:
+                registry.clear()
+            started = time.perf_counter()
+            await operation()
+            samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def compare(results, baseline, threshold):
+    """Names of benchmark/mode pairs whose median got slower than the baseline by more than `threshold`"""
+    regressions = []
+    for name, modes in results.items():
+        for mode, summary in modes.items():
+            previous = baseline.get(name, {}).get(mode)
+            if previous is not None and summary['median_us'] > previous * (1 + threshold):
+                regressions.append(f"{name} ({mode})")
+    return regressions
+
+
+async def main(args=None):
+    parsed_args = parse_args(args)
+    fixture = Fixture()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        await fixture.setup()
+
+    results = {}
+    for name in parsed_args.only:
+        results[name] = {
+            mode: await run_benchmark(getattr(fixture, name), parsed_args.iterations, mode == 'cold')
+            for mode in ('cold', 'warm')
+        }
+
+    baseline = {}
+    if os.path.exists(parsed_args.baseline):
+        with open(parsed_args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    elif not parsed_args.save_baseline:
+        # Medians only compare on the machine that recorded them, so no baseline is checked in
+        print(f"No baseline at {parsed_args.baseline}; record one on this machine with --save_baseline", file=sys.stderr)
+
+    for name, modes in results.items():
+        for mode, summary in modes.items():
+            previous = baseline.get(name, {}).get(mode)
+            change = f"{(summary['median_us'] / previous - 1) * 100:+6.1f}%" if previous else "   n/a"
+            print(
+                f"{name:24} {mode:4}  median {summary['median_us']:9.1f}us  p95 {summary['p95_us']:9.1f}us  "
+                f"vs baseline {change}"
+            )
+
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if parsed_args.save_baseline:
+        medians = {name: {mode: s['median_us'] for mode, s in modes.items()} for name, modes in results.items()}
+        with open(parsed_args.baseline, 'w') as baseline_file:
+            json.dump({**baseline, **medians}, baseline_file, indent=2)
+        print(f"Saved baseline to {parsed_args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, parsed_args.threshold)
+    if regressions:
+        print(f"Regressions beyond {parsed_args.threshold:.0%}: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from ticket_service import TicketService
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Compare per-request latency of the subprocess scripts against the in-process TicketService"
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=10,
+        help="Number of issue -> redeem -> verify cycles per path",
+    )
+    return parser.parse_args(args)
+
+
+def run_script(cmd):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + cmd, capture_output=True, text=True)
+    return time.perf_counter() - start, result.stdout
+
+
+def subprocess_cycle(ticket_id: int, wallet_id: int):
+    """One ticket through the numbered scripts, scraping stdout the way the old Flask layer did"""
+    timings = {}
+
+    timings['initial'], stdout = run_script([
+        '01_server_initial_data_set.py',
+        '--ticket_id', str(ticket_id),
+        '--ticket_owner', str(wallet_id),
+        '--is_redeemed', '0'
+    ])
+    line = next(line for line in stdout.split('\n') if '--user_id_1' in line)
+    user_id = line.split('--user_id_1')[1].split('--store_id_1')[0].strip()
+    store_id = line.split('--store_id_1')[1].strip()
+
+    timings['redeem'], stdout = run_script([
+        '02_redeem_ticket.py',
+        '--ticket_id', str(ticket_id),
+        '--user_id_1', user_id,
+        '--wallet_id', str(wallet_id),
+        '--store_id_1', store_id
+    ])
+    line = next(line for line in stdout.split('\n') if '--party_ids_to_store_ids' in line)
+    party_ids_to_store_ids = line.split('--party_ids_to_store_ids')[1].strip()
+
+    timings['verify'], _ = run_script([
+        '03_multi_party_compute.py',
+        '--store_id_1', store_id,
+        '--party_ids_to_store_ids', party_ids_to_store_ids
+    ])
+    return timings
+
+
+async def inprocess_cycle(service: TicketService, ticket_id: int, wallet_id: int):
+    """One ticket through TicketService on the current event loop"""
+    timings = {}
+
+    start = time.perf_counter()
+    issued = await service.issue_ticket(ticket_id, wallet_id, 0)
+    timings['initial'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    redeemed = await service.redeem_ticket(issued['user_id'], issued['store_id'], ticket_id, wallet_id)
+    timings['redeem'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await service.verify_ticket(redeemed['store_id'], redeemed['party_ids_to_store_ids'])
+    timings['verify'] = time.perf_counter() - start
+    return timings
+
+
+def summarize(name, samples):
+    print(f"\n{name}")
+    for phase in ('initial', 'redeem', 'verify'):
+        values = [sample[phase] for sample in samples]
+        print(
+            f"  {phase:<8} mean {statistics.mean(values):7.3f}s  "
+            f"p50 {statistics.median(values):7.3f}s  max {max(values):7.3f}s"
+        )
+
+
+async def main(args=None):
+    parsed_args = parse_args(args)
+    # Unique ticket ids: issuing an id again overwrites its index row while an earlier cycle may still use it
+    ticket_ids = random.sample(range(1, 1000000), 2 * parsed_args.iterations)
+    tickets = [(ticket_id, random.randint(1, 10000)) for ticket_id in ticket_ids]
+    subprocess_tickets, inprocess_tickets = tickets[:parsed_args.iterations], tickets[parsed_args.iterations:]
+
+    subprocess_samples = [subprocess_cycle(ticket_id, wallet_id) for ticket_id, wallet_id in subprocess_tickets]
+
+    service = TicketService()
+    await service.start()
+    try:
+        inprocess_samples = [
+            await inprocess_cycle(service, ticket_id, wallet_id) for ticket_id, wallet_id in inprocess_tickets
+        ]
+    finally:
+        await service.close()
+
+    summarize("subprocess (python3 0X_*.py)", subprocess_samples)
+    summarize("in-process (TicketService)", inprocess_samples)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SCRIPTS = ('01_server_initial_data_set.py', '02_redeem_ticket.py', '03_multi_party_compute.py')
+
+SERVERS = {
+    'flask': [sys.executable, '-m', 'flask', '--app', 'flask_app', 'run', '--port', '{port}'],
+    'async': [sys.executable, '-m', 'hypercorn', 'async_app:app', '--bind', '127.0.0.1:{port}'],
+}
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Measure script start-up time and the apps' time to first request"
+    )
+    parser.add_argument("--iterations", type=int, default=5, help="Runs per measurement")
+    parser.add_argument("--servers", nargs="*", choices=sorted(SERVERS), default=sorted(SERVERS))
+    parser.add_argument("--port", type=int, default=5099, help="Port the apps are started on")
+    parser.add_argument(
+        "--fake",
+        action="store_true",
+        help="Serve from the in-memory cluster (NILLION_FAKE_CLUSTER) so no devnet is needed",
+    )
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for the first response")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this file")
+    return parser.parse_args(args)
+
+
+def script_startup(script):
+    """Wall time of `python <script> --help`: interpreter start, imports and argument parsing"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, script, '--help'], check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def post_initial(port):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/initial",
+        data=json.dumps({'ticket_id': 1, 'ticket_owner': 5, 'is_redeemed': 0}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def time_to_first_request(command, port, env, timeout):
+    """Seconds from spawning the app until it accepts a connection and until /api/initial first succeeds"""
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [part.format(port=port) for part in command],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        ready = None
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with {server.returncode} before serving")
+            try:
+                attempt = time.perf_counter()
+                result = post_initial(port)
+            except urllib.error.HTTPError as e:
+                raise RuntimeError(f"First request failed: {e.read().decode()}")
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+                continue
+            ready = ready or attempt
+            if result.get('status') != 'success':
+                raise RuntimeError(f"First request failed: {result.get('message')}")
+            return {
+                'ready_s': ready - started,
+                'first_response_s': time.perf_counter() - started,
+            }
+        raise RuntimeError(f"No response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(args=None):
+    parsed_args = parse_args(args)
+    env = dict(os.environ)
+    if parsed_args.fake:
+        env['NILLION_FAKE_CLUSTER'] = '1'
+
+    results = {'scripts': {}, 'servers': {}}
+    for script in SCRIPTS:
+        samples = [script_startup(script) for _ in range(parsed_args.iterations)]
+        results['scripts'][script] = {'median_s': statistics.median(samples), 'min_s': min(samples)}
+        print(f"{script:32} start-up median {statistics.median(samples) * 1000:7.1f}ms")
+
+    for name in parsed_args.servers:
+        runs = [
+            time_to_first_request(SERVERS[name], parsed_args.port, env, parsed_args.timeout)
+            for _ in range(parsed_args.iterations)
+        ]
+        summary = {key: statistics.median(run[key] for run in runs) for key in ('ready_s', 'first_response_s')}
+        results['servers'][name] = summary
+        print(
+            f"{name:32} listening after {summary['ready_s'] * 1000:7.1f}ms, "
+            f"first /api/initial answered after {summary['first_response_s'] * 1000:7.1f}ms"
+        )
+
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+
+from ticket_computation import BATCH_WIDTHS
+from ticket_service import TicketService
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Issue many tickets from a CSV or JSONL file with parallel stores and checkpoint/resume"
+    )
+    parser.add_argument(
+        "--input",
+        required=True,
+        type=str,
+        help="CSV (with a header row) or JSONL file of ticket_id, ticket_owner and optional is_redeemed",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="JSONL file of completed tickets, appended as they finish (defaults to <input>.checkpoint.jsonl)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="Number of ticket stores kept in flight",
+    )
+    parser.add_argument(
+        "--book_width",
+        type=int,
+        default=0,
+        choices=(0,) + BATCH_WIDTHS,
+        help="Pack this many tickets per store as a ticket book; 0 stores one ticket per store",
+    )
+    parser.add_argument(
+        "--report_interval",
+        type=float,
+        default=5.0,
+        help="Seconds between throughput/ETA reports",
+    )
+    return parser.parse_args(args)
+
+
+def read_tickets(path):
+    with open(path, newline='') as tickets_file:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(tickets_file)
+        else:
+            for line in tickets_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def load_checkpoint(path):
+    """ticket_ids already issued by an earlier run"""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as checkpoint_file:
+        return {str(json.loads(line)['ticket_id']) for line in checkpoint_file if line.strip()}
+
+
+class Progress:
+    def __init__(self, total):
+        self.total = total
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.completed / elapsed if elapsed else 0.0
+        remaining = self.total - self.completed - self.failed - self.skipped
+        eta = f"{remaining / rate:.0f}s" if rate else "unknown"
+        print(
+            f"{self.completed} issued, {self.skipped} skipped, {self.failed} failed of {self.total} "
+            f"- {rate:.2f} tickets/s, ETA {eta}",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+async def issue_block(service: TicketService, tickets, book_width):
+    """Checkpoint entries for a block of tickets: one store each, or one ticket book for all of them"""
+    if not book_width:
+        ticket = tickets[0]
+        issued = await service.issue_ticket(ticket['ticket_id'], ticket['ticket_owner'], ticket.get('is_redeemed') or 0)
+        return [{
+            'ticket_id': ticket['ticket_id'],
+            'ticket_owner': ticket['ticket_owner'],
+            'user_id': issued['user_id'],
+            'store_id': issued['store_id'],
+        }]
+
+    issued = await service.issue_ticket_book(
+        [(ticket['ticket_id'], ticket['ticket_owner'], ticket.get('is_redeemed') or 0) for ticket in tickets],
+        book_width
+    )
+    return [{
+        'ticket_id': ticket['ticket_id'],
+        'ticket_owner': ticket['ticket_owner'],
+        'user_id': issued['user_id'],
+        'store_id': issued['store_id'],
+        'slot': slot,
+    } for slot, ticket in enumerate(tickets)]
+
+
+async def import_tickets(service: TicketService, input_path, checkpoint_path, concurrency, report_interval,
+                         book_width=0):
+    done = load_checkpoint(checkpoint_path)
+    progress = Progress(sum(1 for _ in read_tickets(input_path)))
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    with open(checkpoint_path, 'a') as checkpoint:
+        async def worker():
+            while (tickets := await queue.get()) is not None:
+                try:
+                    entries = await issue_block(service, tickets, book_width)
+                except Exception as e:
+                    progress.failed += len(tickets)
+                    ticket_ids = ", ".join(str(ticket['ticket_id']) for ticket in tickets)
+                    print(f"Tickets {ticket_ids} failed: {str(e)}", file=sys.stderr)
+                    continue
+
+                # Record the paid store right away so a crash never causes a second payment for it
+                for entry in entries:
+                    checkpoint.write(json.dumps(entry) + '\n')
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                progress.completed += len(entries)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(report_interval)
+                progress.report()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        reporting = asyncio.create_task(reporter())
+
+        block = []
+        queued = set()
+        for ticket in read_tickets(input_path):
+            ticket_id = str(ticket['ticket_id'])
+            # Tickets from the checkpoint and repeated rows both count as skipped, so the ETA reaches zero
+            if ticket_id in done:
+                progress.skipped += 1
+                continue
+            if ticket_id in queued:
+                progress.skipped += 1
+                print(f"Ticket {ticket_id} appears more than once in {input_path}; issuing it once", file=sys.stderr)
+                continue
+            queued.add(ticket_id)
+            block.append(ticket)
+            if len(block) >= max(book_width, 1):
+                await queue.put(block)
+                block = []
+        if block:
+            await queue.put(block)
+
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        reporting.cancel()
+
+    progress.report()
+    return progress
+
+
+async def main(args=None):
+    parsed_args = parse_args(args)
+    service = TicketService()
+    await service.start()
+    try:
+        await import_tickets(
+            service,
+            parsed_args.input,
+            parsed_args.checkpoint or f"{parsed_args.input}.checkpoint.jsonl",
+            parsed_args.concurrency,
+            parsed_args.report_interval,
+            parsed_args.book_width,
+        )
+    finally:
+        await service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+from py_nillion_client import NodeKey, UserKey
+
+from metrics import timed
+
+
+def create_client(seed):
+    # nillion_python_helpers pulls in cosmpy, so it is imported with the first client
+    from nillion_python_helpers import create_nillion_client
+    return create_nillion_client(
+        UserKey.from_seed(seed),
+        NodeKey.from_seed(seed)
+    )
+
+
+class ClientRegistry:
+    """Bounded LRU of Nillion clients keyed by (seed, cluster_id), shared by issuer and user identities"""
+
+    def __init__(self, maxsize=32, factory=None):
+        self.maxsize = maxsize
+        # factory(seed) -> client; swapped out by fake_nillion for offline runs
+        self.factory = factory or create_client
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Called with each evicted client, e.g. to stop work tied to it
+        self.on_evict = []
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, seed, cluster_id):
+        key = (seed, cluster_id)
+        # Creation happens under the lock so concurrent callers never build the same client twice
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+
+            self.misses += 1
+            with timed('client_creation'):
+                client = self.factory(seed)
+            self._clients[key] = client
+            if len(self._clients) > self.maxsize:
+                _, evicted = self._clients.popitem(last=False)
+                self.evictions += 1
+                for callback in self.on_evict:
+                    callback(evicted)
+            return client
+
+    def clear(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            for callback in self.on_evict:
+                callback(client)
+
+    def stats(self):
+        return {
+            'size': len(self._clients),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+registry = ClientRegistry(int(os.getenv("NILLION_CLIENT_CACHE_SIZE", "32")))
+
+
+def get_client(seed, cluster_id):
+    return registry.get(seed, cluster_id)
@@ -0,0 +1,140 @@
+import asyncio
+import re
+from collections import OrderedDict
+import py_nillion_client as nillion
+
+import nillion_config
+from client_registry import registry
+
+# compute_ids are UUIDs; a failed compute's error message names its own
+COMPUTE_ID = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", re.IGNORECASE)
+
+
+class ComputeDispatcher:
+    """Reads one client's compute event stream and resolves the waiter registered for each compute_id"""
+
+    def __init__(self, client, max_unclaimed=1024, backoff=0.1, max_backoff=5.0, max_failures=8):
+        self.client = client
+        self.max_unclaimed = max_unclaimed
+        # A broken event stream is read again after backoff, 2 * backoff, ... up to max_backoff seconds;
+        # after max_failures breaks in a row the dispatcher stops and the next wait starts a new one
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+        self._waiters = {}
+        # Results (or compute errors) that finished before anyone waited, and compute_ids whose waiter gave up
+        self._unclaimed = OrderedDict()
+        self._abandoned = OrderedDict()
+        self._task = None
+
+    def _remember(self, entries, compute_id, value):
+        entries[compute_id] = value
+        if len(entries) > self.max_unclaimed:
+            entries.popitem(last=False)
+
+    def _resolve(self, compute_id, result=None, error=None):
+        future = self._waiters.pop(compute_id, None)
+        if future is not None:
+            if not future.done():
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+        elif self._abandoned.pop(compute_id, None) is None:
+            self._remember(self._unclaimed, compute_id, error if error is not None else result)
+
+    def _fail_all(self, error):
+        for future in self._waiters.values():
+            if not future.done():
+                future.set_exception(error)
+        self._waiters.clear()
+
+    def _failed_compute_id(self, error):
+        """compute_id named by a ComputeError, or None when it does not name one"""
+        if not isinstance(error, nillion.ComputeError):
+            return None
+        compute_ids = COMPUTE_ID.findall(str(error))
+        # Prefer an id someone is waiting for, in case the message names other ids too
+        return next((compute_id for compute_id in compute_ids if compute_id in self._waiters),
+                    compute_ids[0] if compute_ids else None)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                compute_event = await self.client.next_compute_event()
+            except Exception as e:
+                compute_id = self._failed_compute_id(e)
+                if compute_id is not None:
+                    # One compute failed; the others are still running
+                    self._resolve(compute_id, error=e)
+                    continue
+
+                # The event stream itself broke, so no waiter can get its result
+                failures += 1
+                self._fail_all(e)
+                if failures >= self.max_failures:
+                    print(f"Compute event stream failed {failures} times in a row, stopping its dispatcher: {str(e)}")
+                    _drop(self)
+                    return
+                await asyncio.sleep(min(self.backoff * 2 ** (failures - 1), self.max_backoff))
+                continue
+
+            failures = 0
+            if not nillion_config.network.compute_finished(compute_event):
+                continue
+            self._resolve(compute_event.uuid, compute_event.result.value)
+
+    async def wait(self, compute_id, timeout=None):
+        """Result of `compute_id`; raises asyncio.TimeoutError after `timeout` seconds"""
+        if compute_id in self._unclaimed:
+            result = self._unclaimed.pop(compute_id)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[compute_id] = future
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Drop the late result instead of keeping it as unclaimed
+            self._waiters.pop(compute_id, None)
+            self._remember(self._abandoned, compute_id, True)
+            raise
+
+    def close(self):
+        """Stop reading events; computes still being waited on fail instead of waiting out their timeout"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._fail_all(RuntimeError("The compute dispatcher was closed, e.g. because its client was evicted"))
+
+
+_dispatchers = {}
+
+
+def dispatcher_for(client):
+    """The single dispatcher reading `client`'s compute events"""
+    dispatcher = _dispatchers.get(id(client))
+    if dispatcher is None:
+        dispatcher = _dispatchers[id(client)] = ComputeDispatcher(client)
+    return dispatcher
+
+
+def _drop(dispatcher):
+    """Forget a dispatcher that stopped, so the client's next wait starts a fresh one"""
+    if _dispatchers.get(id(dispatcher.client)) is dispatcher:
+        del _dispatchers[id(dispatcher.client)]
+
+
+def _discard(client):
+    dispatcher = _dispatchers.pop(id(client), None)
+    if dispatcher is not None:
+        dispatcher.close()
+
+
+registry.on_evict.append(_discard)
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import fake_nillion
+
+# Drives a running server at import time; not a pytest module
+collect_ignore = ["flask_test.py"]
+
+
+@pytest.fixture
+def fake_cluster(tmp_path, monkeypatch):
+    """An installed in-memory cluster, with the service's files under tmp_path"""
+    # Program paths are relative to this directory, as when the apps run
+    monkeypatch.chdir(os.path.dirname(os.path.abspath(__file__)))
+    monkeypatch.setenv("TICKET_DATA_DIR", str(tmp_path))
+    monkeypatch.setenv("TICKET_INDEX_DB", str(tmp_path / "ticket_index.sqlite3"))
+    installed = fake_nillion.install(fake_nillion.FakeCluster(seed=0))
+    yield installed.cluster
+    installed.undo()
+
+
+@pytest.fixture
+def batch_programs(fake_cluster, tmp_path, monkeypatch):
+    """Compiled ticket_check_batch_<width> programs under ../nada_programs/target, for ticket book tests"""
+    from ticket_computation import BATCH_WIDTHS
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    target = os.path.join(here, "..", "nada_programs", "target")
+    if all(os.path.exists(os.path.join(target, f"ticket_check_batch_{width}.nada.bin")) for width in BATCH_WIDTHS):
+        return fake_cluster
+
+    # Without `nada build` there are no batch binaries. The fake cluster evaluates programs by their
+    # input names, so the compiled ticket_check stands in for them; the name is appended so each copy
+    # has its own digest in the program registry.
+    scratch_target = tmp_path / "nada_programs" / "target"
+    scratch_target.mkdir(parents=True)
+    with open(os.path.join(target, "ticket_check.nada.bin"), 'rb') as program_file:
+        program = program_file.read()
+    (scratch_target / "ticket_check.nada.bin").write_bytes(program)
+    for width in BATCH_WIDTHS:
+        name = f"ticket_check_batch_{width}"
+        (scratch_target / f"{name}.nada.bin").write_bytes(program + name.encode())
+    (tmp_path / "ticket_check").mkdir()
+    monkeypatch.chdir(tmp_path / "ticket_check")
+    return fake_cluster
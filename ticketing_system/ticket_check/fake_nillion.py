@@ -0,0 +1,356 @@
+import asyncio
+import hashlib
+import os
+import random
+import secrets
+import tempfile
+import threading
+import time
+import uuid
+import py_nillion_client as nillion
+from cosmpy.aerial.client import Account
+from cosmpy.aerial.exceptions import BroadcastError
+
+import client_registry
+import nillion_config
+import program_registry
+
+# Operations that can be given latency and failure rates
+OPERATIONS = ('quote', 'pay', 'broadcast', 'store_program', 'store_values', 'update_values', 'compute')
+
+BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def fake_peer_id(seed, role):
+    """A deterministic base58 sha256 multihash, the shape ProgramBindings accepts as a party id"""
+    number = int.from_bytes(b"\x12\x20" + hashlib.sha256(f"{role}:{seed}".encode()).digest(), 'big')
+    encoded = ""
+    while number:
+        number, digit = divmod(number, 58)
+        encoded = BASE58_ALPHABET[digit] + encoded
+    return encoded
+
+
+def plain_value(value):
+    """The int, or list of ints for an Array, held by a py_nillion_client value"""
+    value = value.value
+    return [element.value for element in value] if isinstance(value, list) else value
+
+
+def evaluate_ticket_check(inputs):
+    """Outputs of ticket_check or ticket_check_batch_<width> for a dict of input name -> int or list of ints"""
+    if 'user_ticket' in inputs:
+        return {'status': (
+            (inputs['user_ticket'] - inputs['ticket_id'])
+            + (inputs['user_wallet'] - inputs['ticket_owner'])
+            + inputs['is_redeemed']
+            + inputs['user_redeem']
+        )}
+    if 'user_tickets' not in inputs:
+        raise KeyError("no ticket_check inputs")
+    slots = zip(
+        inputs['user_tickets'], inputs['ticket_ids'], inputs['user_wallets'], inputs['ticket_owners'],
+        inputs['is_redeemed'], inputs['user_redeems'],
+    )
+    return {'statuses': [
+        (user_ticket - ticket_id) + (user_wallet - ticket_owner) + is_redeemed + user_redeem
+        for user_ticket, ticket_id, user_wallet, ticket_owner, is_redeemed, user_redeem in slots
+    ]}
+
+
+def ticket_check_program(inputs):
+    """Name of the ticket_check program a set of compute inputs belongs to"""
+    if 'user_ticket' in inputs:
+        return 'ticket_check'
+    return f"ticket_check_batch_{len(inputs.get('user_tickets', ()))}"
+
+
+class FakeQuote:
+    def __init__(self, cost, expires_at):
+        self.cost = cost
+        self.expires_at = expires_at
+        self.nonce = uuid.uuid4().bytes
+
+
+class FakeReceipt:
+    def __init__(self, quote, tx_hash):
+        self.quote = quote
+        self.tx_hash = tx_hash
+
+
+class FakeComputeFinishedEvent:
+    def __init__(self, uuid, result):
+        self.uuid = uuid
+        self.result = FakeComputeResult(result)
+
+
+class FakeComputeResult:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeSubmittedTx:
+    def __init__(self, tx_hash, delay):
+        self.tx_hash = tx_hash
+        self._delay = delay
+
+    def wait_to_complete(self):
+        time.sleep(self._delay)
+        return self
+
+
+class FakeCluster:
+    """In-memory stand-in for a Nillion devnet and its nilchain, with per-operation latency and failures"""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, cost=1, seed=None):
+        # latency and failure_rate are either one value for every operation or a dict keyed by OPERATIONS
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.cost = cost
+        self.programs = {}
+        self.stores = {}
+        self.calls = {operation: 0 for operation in OPERATIONS}
+        self.failures = {operation: 0 for operation in OPERATIONS}
+        self.ledger = FakeLedgerClient(self)
+        self.clients_created = 0
+        self._spent = set()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency=float(os.getenv("NILLION_FAKE_LATENCY_MS", "0")) / 1000,
+            failure_rate=float(os.getenv("NILLION_FAKE_FAILURE_RATE", "0")),
+        )
+
+    def _setting(self, setting, operation):
+        return setting.get(operation, 0.0) if isinstance(setting, dict) else setting
+
+    def _should_fail(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+            failed = self._random.random() < self._setting(self.failure_rate, operation)
+            if failed:
+                self.failures[operation] += 1
+            return failed
+
+    async def simulate(self, operation, error=nillion.TimeoutError):
+        """Wait out the operation's latency, then raise `error` if it was picked to fail"""
+        await asyncio.sleep(self._setting(self.latency, operation))
+        if self._should_fail(operation):
+            raise error(f"Injected {operation} failure")
+
+    def client(self, seed):
+        """A new client for `seed`, as create_nillion_client builds one; ClientRegistry does the caching"""
+        with self._lock:
+            self.clients_created += 1
+        return FakeNillionClient(self, seed)
+
+    def spend(self, receipt):
+        """Accept a receipt once, as the network does"""
+        if not isinstance(receipt, FakeReceipt):
+            raise nillion.PaymentError("Not a receipt issued by this cluster")
+        with self._lock:
+            if receipt.quote.nonce in self._spent:
+                raise nillion.PaymentError("Receipt was already used")
+            if receipt.quote.expires_at < time.time():
+                raise nillion.PaymentError("Quote expired")
+            self._spent.add(receipt.quote.nonce)
+
+    def quote(self):
+        return FakeQuote(self.cost, time.time() + 600)
+
+    def stats(self):
+        return {
+            'calls': dict(self.calls),
+            'failures': dict(self.failures),
+            'clients_created': self.clients_created,
+            'programs': len(self.programs),
+            'stores': len(self.stores),
+        }
+
+
+class FakeNillionClient:
+    """The NillionClient methods this project calls, backed by a FakeCluster"""
+
+    def __init__(self, cluster, seed):
+        self.cluster = cluster
+        self.user_id = fake_peer_id(seed, 'user')
+        self.party_id = fake_peer_id(seed, 'party')
+        self._events = asyncio.Queue()
+
+    async def request_price_quote(self, cluster_id, operation):
+        await self.cluster.simulate('quote')
+        return self.cluster.quote()
+
+    async def store_program(self, cluster_id, program_name, program_path, receipt):
+        await self.cluster.simulate('store_program')
+        self.cluster.spend(receipt)
+        program_id = f"{self.user_id}/{program_name}"
+        self.cluster.programs[program_id] = program_path
+        return program_id
+
+    async def store_values(self, cluster_id, values, permissions, receipt):
+        await self.cluster.simulate('store_values')
+        self.cluster.spend(receipt)
+        store_id = str(uuid.uuid4())
+        self.cluster.stores[store_id] = {name: plain_value(value) for name, value in values.dict().items()}
+        return store_id
+
+    async def update_values(self, cluster_id, store_id, values, receipt):
+        await self.cluster.simulate('update_values')
+        self.cluster.spend(receipt)
+        if store_id not in self.cluster.stores:
+            raise nillion.TimeoutError(f"Unknown store_id {store_id}")
+        self.cluster.stores[store_id] = {name: plain_value(value) for name, value in values.dict().items()}
+        return str(uuid.uuid4())
+
+    async def compute(self, cluster_id, bindings, store_ids, values, receipt):
+        # Permissions and program bindings are not checked; the program is inferred from the input names
+        self.cluster.spend(receipt)
+        compute_id = str(uuid.uuid4())
+        inputs = {name: plain_value(value) for name, value in values.dict().items()}
+        for store_id in store_ids:
+            if store_id not in self.cluster.stores:
+                raise nillion.ComputeError(f"Unknown store_id {store_id}")
+            inputs.update(self.cluster.stores[store_id])
+        program_name = ticket_check_program(inputs)
+        if not any(program_id.endswith(f"/{program_name}") for program_id in self.cluster.programs):
+            raise nillion.ComputeError(f"compute initialization failed: program not found: {program_name}")
+        asyncio.get_running_loop().create_task(self._finish(compute_id, inputs))
+        return compute_id
+
+    async def _finish(self, compute_id, inputs):
+        try:
+            await self.cluster.simulate('compute', nillion.ComputeError)
+            event = FakeComputeFinishedEvent(compute_id, evaluate_ticket_check(inputs))
+        except Exception as e:
+            # Like the network's, the error names the compute that failed
+            event = nillion.ComputeError(f"compute {compute_id} failed: {str(e)}")
+        await self._events.put(event)
+
+    async def next_compute_event(self):
+        event = await self._events.get()
+        if isinstance(event, Exception):
+            raise event
+        return event
+
+
+class FakeLedgerClient:
+    """Account sequence bookkeeping for the nilchain; payments confirm after the 'broadcast' latency"""
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+        self.sequences = {}
+        self.transactions = 0
+        self._lock = threading.Lock()
+
+    def query_account(self, address):
+        with self._lock:
+            return Account(address, 0, self.sequences.get(str(address), 0))
+
+    def broadcast(self, sender, account, messages):
+        if self.cluster._should_fail('broadcast'):
+            raise BroadcastError("", "Injected broadcast failure")
+        address = str(sender.address())
+        with self._lock:
+            expected = self.sequences.get(address, 0)
+            if account is not None and account.sequence != expected:
+                raise BroadcastError("", f"account sequence mismatch, expected {expected}, got {account.sequence}")
+            self.sequences[address] = expected + 1
+            self.transactions += 1
+        return FakeSubmittedTx(uuid.uuid4().hex.upper(), self.cluster._setting(self.cluster.latency, 'broadcast'))
+
+
+class FakeNetwork(nillion_config.Network):
+    """Payments settle on the cluster's in-memory ledger and compute events come from fake clients"""
+
+    def __init__(self, cluster):
+        self.cluster = cluster
+
+    def ledger_client(self, config):
+        return self.cluster.ledger
+
+    async def quote_and_pay(self, client, operation, payments_wallet, payments_client, cluster_id):
+        quote = await client.request_price_quote(cluster_id, operation)
+        await self.cluster.simulate('pay', nillion.PaymentError)
+        return FakeReceipt(quote, uuid.uuid4().hex.upper())
+
+    def broadcast(self, payments_client, quotes, address, wallet, account, gas_limit, memo):
+        return self.cluster.ledger.broadcast(wallet, account, quotes)
+
+    def receipt(self, quote, tx_hash):
+        return FakeReceipt(quote, tx_hash)
+
+    def compute_finished(self, event):
+        return isinstance(event, FakeComputeFinishedEvent)
+
+
+class Installed:
+    """Handle returned by install(); undo() puts back the real network, clients and environment"""
+
+    def __init__(self, cluster, restore):
+        self.cluster = cluster
+        self._restore = restore
+
+    def undo(self):
+        if self._restore is None:
+            return
+        restore, self._restore = self._restore, None
+        restore()
+        _installed.remove(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.undo()
+
+
+_installed = []
+
+
+def install(cluster=None) -> Installed:
+    """Serve this process's Nillion and nilchain calls from an in-memory cluster
+
+    Injects the cluster's client factory, payment network and a scratch program registry, and
+    returns a handle whose undo() restores them. A second call returns the first handle.
+    """
+    if _installed:
+        return _installed[0]
+    cluster = cluster or FakeCluster.from_env()
+
+    # Values the config and payment setup read from the devnet env file; the key only has to parse
+    scratch = tempfile.mkdtemp(prefix="fake-nillion-")
+    environment = {
+        "NILLION_CLUSTER_ID": "fake-cluster",
+        "NILLION_NILCHAIN_GRPC": "localhost:26649",
+        "NILLION_NILCHAIN_CHAIN_ID": "nillion-chain-fake",
+        f"{nillion_config.PRIVATE_KEY_PREFIX}0": secrets.token_hex(32),
+        # A ticket index from a fake cluster must not leak into the real one
+        "TICKET_INDEX_DB": os.path.join(scratch, "ticket_index.sqlite3"),
+    }
+    added = [name for name in environment if name not in os.environ]
+    for name in added:
+        os.environ[name] = environment[name]
+
+    factory = client_registry.registry.factory
+    client_registry.registry.factory = cluster.client
+    network = nillion_config.use_network(FakeNetwork(cluster))
+    registry = program_registry.use_registry(
+        program_registry.ProgramRegistry(os.path.join(scratch, "ticket_programs.json"))
+    )
+    client_registry.registry.clear()
+
+    def restore():
+        client_registry.registry.factory = factory
+        nillion_config.use_network(network)
+        program_registry.use_registry(registry)
+        client_registry.registry.clear()
+        for name in added:
+            os.environ.pop(name, None)
+
+    installed = Installed(cluster, restore)
+    _installed.append(installed)
+    return installed
@@ -1,138 +1,39 @@
-from flask import Flask, jsonify, request
-import subprocess
-import json
+import os
+from flask import Flask, Response, jsonify, request
 
-app = Flask(__name__)
-
-
-@app.route('/api/initial', methods=['POST'])
-def initial_setup():
-    try:
-        data = request.get_json()
-        ticket_id = data.get('ticket_id', 1)
-        ticket_owner = data.get('ticket_owner', 5)
-        is_redeemed = data.get('is_redeemed', 0)
-
-        cmd = [
-            'python3',
-            '01_server_initial_data_set.py',
-            '--ticket_id', str(ticket_id),
-            '--ticket_owner', str(ticket_owner),
-            '--is_redeemed', str(is_redeemed)
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        # Look for user_id and store_id in the output
-        user_id = None
-        store_id = None
-
-        for line in result.stdout.split('\n'):
-            if '--user_id_1' in line:
-                user_id = line.split('--user_id_1')[1].split('--store_id_1')[0].strip()
-                store_id = line.split('--store_id_1')[1].strip()
-
-        if user_id and store_id:
-            return jsonify({
-                'cmd': ' '.join(cmd),
-                'status': 'success',
-                'user_id': user_id,
-                'store_id': store_id
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': f'Failed to get IDs: {result.stderr}'
-            }), 500
+import ticket_api
+from metrics import metrics
+from ticket_service import EventLoopThread, TicketService
 
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
-
-
-@app.route('/api/redeem', methods=['POST'])
-def redeem_ticket():
-    try:
-        data = request.get_json()
-        user_id = data.get('user_id')
-        store_id = data.get('store_id')
-        ticket_id = data.get('ticket_id')
-        wallet_id = data.get('wallet_id')
-
-        cmd = [
-            'python3',
-            '02_redeem_ticket.py',
-            '--ticket_id', str(ticket_id),
-            '--user_id_1', str(user_id),
-            '--wallet_id', str(wallet_id),
-            '--store_id_1', str(store_id)
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        # Look for party_ids_to_store_ids in the output
-        party_mapping = None
-        for line in result.stdout.split('\n'):
-            if '--party_ids_to_store_ids' in line:
-                party_mapping = line.split('--party_ids_to_store_ids')[1].strip()
-
-        if party_mapping:
-            return jsonify({
-                'cmd': ' '.join(cmd),
-                'status': 'success',
-                'store_id': store_id,
-                'party_ids_to_store_ids': party_mapping
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': f'Failed to get party mapping: {result.stderr}'
-            }), 500
+app = Flask(__name__)
 
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
+if os.getenv("NILLION_FAKE_CLUSTER"):
+    # Offline mode for load tests: an in-memory stand-in for the devnet and nilchain
+    import fake_nillion
+    fake_nillion.install()
 
+# Nillion clients and payments are reused across requests on one long-lived loop
+loop_thread = EventLoopThread()
+service = TicketService()
+loop_thread.run(service.start())
 
-@app.route('/api/verify', methods=['POST'])
-def verify_ticket():
-    try:
-        data = request.get_json()
-        store_id = data.get('store_id')
-        party_ids_to_store_ids = data.get('party_ids_to_store_ids')
 
-        cmd = [
-            'python3',
-            '03_multi_party_compute.py',
-            '--store_id_1', store_id,
-            '--party_ids_to_store_ids', party_ids_to_store_ids
-        ]
-        print(cmd)
-        print(cmd)
-        print(cmd)
-        print(cmd)
-        print(cmd)
+def view(route):
+    def handle(**params):
+        data = request.get_json(silent=True) if request.method == 'POST' else None
+        body, status = loop_thread.run(ticket_api.respond(route, service, data, **params))
+        return jsonify(body), status
+    return handle
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
 
-        return jsonify({
-            'cmd': ' '.join(cmd),
-            'status': 'success',
-            'result':json.loads(''.join(result.stdout).split('The result is')[-1].strip('\n').strip(' ').replace('\'','\"')),
-            'store_id': store_id,
-            'party_ids_to_store_ids': party_ids_to_store_ids
-        })
+for route in ticket_api.ROUTES:
+    app.add_url_rule(route.rule, route.endpoint, view(route), methods=route.methods)
 
-    except Exception as e:
-        return jsonify({
-            'status': 'error',
-            'message': str(e)
-        }), 500
 
+@app.route('/metrics', methods=['GET'])
+def scrape_metrics():
+    # Rendered only when scraped; recording a stage is a couple of counter updates
+    return Response(metrics.render(service.stats()), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    app.run(debug=True, port=5001)
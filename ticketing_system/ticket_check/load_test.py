@@ -0,0 +1,216 @@
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PHASES = ('initial', 'redeem', 'verify')
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is open-ended
+BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Drive the /api initial -> redeem -> verify flow concurrently and report per-phase latency"
+    )
+    parser.add_argument("--base_url", type=str, default="http://localhost:5001/api", help="API base URL")
+    parser.add_argument("--cycles", type=int, default=200, help="Number of initial -> redeem -> verify cycles")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Cycles kept in flight (closed loop), or the cap on in-flight cycles when --rate is set",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=None,
+        help="Start cycles at this many per second with Poisson arrivals instead of a closed loop",
+    )
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this file")
+    return parser.parse_args(args)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class PhaseStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.first_start = None
+        self.last_end = None
+
+    def record(self, started, ended, ok):
+        if ok:
+            self.latencies.append(ended - started)
+        else:
+            self.errors += 1
+        self.first_start = started if self.first_start is None else min(self.first_start, started)
+        self.last_end = ended if self.last_end is None else max(self.last_end, ended)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        window = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        histogram = [0] * (len(BUCKETS) + 1)
+        for latency in latencies:
+            histogram[next((i for i, bound in enumerate(BUCKETS) if latency <= bound), len(BUCKETS))] += 1
+        return {
+            'requests': len(latencies) + self.errors,
+            'errors': self.errors,
+            'throughput_rps': len(latencies) / window if window else 0.0,
+            'mean_s': sum(latencies) / len(latencies) if latencies else None,
+            'p50_s': percentile(latencies, 0.50),
+            'p95_s': percentile(latencies, 0.95),
+            'p99_s': percentile(latencies, 0.99),
+            'max_s': latencies[-1] if latencies else None,
+            'histogram': {
+                'buckets_s': list(BUCKETS) + ['+Inf'],
+                'counts': histogram,
+            },
+        }
+
+
+class LoadTest:
+    def __init__(self, base_url, concurrency, timeout):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.phases = {phase: PhaseStats() for phase in PHASES}
+        # Whole initial -> verify cycles, from when each cycle was due to start
+        self.cycles = PhaseStats()
+        self.completed = 0
+        self.failed = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def session(self):
+        # One keep-alive session per worker thread, so connections are reused across cycles
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def call(self, phase, payload, started=None):
+        # `started` backdates the request to when it was due, so time spent queued behind a slow server counts
+        started = time.perf_counter() if started is None else started
+        try:
+            response = self.session().post(f"{self.base_url}/{phase}", json=payload, timeout=self.timeout)
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            data = {'status': 'error', 'message': str(e)}
+        ended = time.perf_counter()
+        ok = data.get('status') == 'success'
+        with self._lock:
+            self.phases[phase].record(started, ended, ok)
+        if not ok:
+            raise RuntimeError(f"{phase} failed: {data.get('message')}")
+        return data
+
+    def cycle(self, ticket_id, wallet_id, scheduled=None):
+        """One initial -> redeem -> verify cycle; `scheduled` is its open-loop arrival time"""
+        started = time.perf_counter() if scheduled is None else scheduled
+        try:
+            issued = self.call(
+                'initial',
+                {'ticket_id': ticket_id, 'ticket_owner': wallet_id, 'is_redeemed': 0},
+                started
+            )
+            redeemed = self.call('redeem', {
+                'user_id': issued['user_id'],
+                'store_id': issued['store_id'],
+                'ticket_id': ticket_id,
+                'wallet_id': wallet_id,
+            })
+            self.call('verify', {
+                'store_id': redeemed['store_id'],
+                'party_ids_to_store_ids': redeemed['party_ids_to_store_ids'],
+            })
+        except RuntimeError as e:
+            with self._lock:
+                self.failed += 1
+                self.cycles.record(started, time.perf_counter(), False)
+            print(f"Ticket {ticket_id}: {e}", file=sys.stderr)
+            return
+        with self._lock:
+            self.completed += 1
+            self.cycles.record(started, time.perf_counter(), True)
+
+    def run(self, cycles, rate=None):
+        tickets = [(random.randint(1, 10 ** 9), random.randint(1, 10 ** 9)) for _ in range(cycles)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            if rate is None:
+                list(executor.map(lambda ticket: self.cycle(*ticket), tickets))
+            else:
+                # Open loop: arrivals follow the schedule whatever the latency, up to the concurrency cap.
+                # Latency is measured from each scheduled arrival, not from when a worker got to it,
+                # so cycles held back by the cap or a slow server are not under-reported
+                next_arrival = started
+                futures = []
+                for ticket in tickets:
+                    time.sleep(max(0.0, next_arrival - time.perf_counter()))
+                    futures.append(executor.submit(self.cycle, *ticket, next_arrival))
+                    next_arrival += random.expovariate(rate)
+                for future in futures:
+                    future.result()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'base_url': self.base_url,
+            'mode': 'closed' if rate is None else 'open',
+            'concurrency': self.concurrency,
+            'rate': rate,
+            'cycles': cycles,
+            'completed': self.completed,
+            'failed': self.failed,
+            'elapsed_s': elapsed,
+            'cycles_per_s': self.completed / elapsed if elapsed else 0.0,
+            'phases': {phase: stats.summary() for phase, stats in self.phases.items()},
+            'cycle': self.cycles.summary(),
+        }
+
+
+def print_report(results):
+    print(f"{results['completed']}/{results['cycles']} cycles in {results['elapsed_s']:.1f}s "
+          f"({results['cycles_per_s']:.2f} cycles/s, {results['failed']} failed)")
+    for phase, summary in [*results['phases'].items(), ('cycle', results['cycle'])]:
+        if summary['p50_s'] is None:
+            print(f"  {phase:8} no successful requests, {summary['errors']} errors")
+            continue
+        print(
+            f"  {phase:8} p50 {summary['p50_s'] * 1000:8.1f}ms  p95 {summary['p95_s'] * 1000:8.1f}ms  "
+            f"p99 {summary['p99_s'] * 1000:8.1f}ms  {summary['throughput_rps']:7.2f} req/s  "
+            f"{summary['errors']} errors"
+        )
+
+
+def main(args=None):
+    parsed_args = parse_args(args)
+    load_test = LoadTest(parsed_args.base_url, parsed_args.concurrency, parsed_args.timeout)
+    results = load_test.run(parsed_args.cycles, parsed_args.rate)
+    print_report(results)
+    if parsed_args.output:
+        with open(parsed_args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import bisect
+import time
+
+import tracing
+
+# Upper bounds (seconds) of the stage latency buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # Per-bucket counts; the last slot is the +Inf bucket. Made cumulative only when rendered
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+    def observe(self, seconds, failed=False):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if failed:
+            self.errors += 1
+
+
+class _Timer:
+    __slots__ = ('histogram', 'span', 'started')
+
+    def __init__(self, histogram, span):
+        self.histogram = histogram
+        self.span = span
+
+    def set(self, key, value):
+        """Attach an attribute such as a store_id or compute_id to the stage's trace span"""
+        self.span.set(key, value)
+
+    def __enter__(self):
+        self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started, failed=exc_type is not None)
+        self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class Metrics:
+    """Latency histograms and error counts per stage, rendered in Prometheus text format on demand"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.stages = {}
+
+    def histogram(self, stage):
+        histogram = self.stages.get(stage)
+        if histogram is None:
+            histogram = self.stages.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def timed(self, stage):
+        """Context manager recording how long its block took, in sync or async code, and tracing it as a span"""
+        return _Timer(self.histogram(stage), tracing.start_span(stage))
+
+    def render(self, gauges=None):
+        lines = [
+            "# HELP ticket_stage_seconds Time spent in each Nillion client, payment and compute stage",
+            "# TYPE ticket_stage_seconds histogram",
+        ]
+        for stage, histogram in sorted(self.stages.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'ticket_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'ticket_stage_seconds_sum{{stage="{stage}"}} {histogram.total}')
+            lines.append(f'ticket_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+        lines.append("# HELP ticket_stage_errors_total Stage calls that raised")
+        lines.append("# TYPE ticket_stage_errors_total counter")
+        for stage, histogram in sorted(self.stages.items()):
+            lines.append(f'ticket_stage_errors_total{{stage="{stage}"}} {histogram.errors}')
+
+        for name, value in sorted(flatten(gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def flatten(stats, prefix="ticket"):
+    """Numeric leaves of nested stats() dicts as ticket_<component>_<name> gauges"""
+    gauges = {}
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            gauges.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            gauges[name] = value
+    return gauges
+
+
+metrics = Metrics()
+
+
+def timed(stage):
+    return metrics.timed(stage)
@@ -0,0 +1,125 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+
+# cosmpy, dotenv and nillion_python_helpers take a few hundred milliseconds to import,
+# so they are loaded on first use rather than when a script or app starts
+
+PRIVATE_KEY_PREFIX = "NILLION_NILCHAIN_PRIVATE_KEY_"
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """Cluster id, nilchain gRPC endpoint and chain id, read from the devnet env file once per process"""
+    from dotenv import load_dotenv
+    home = os.getenv("HOME")
+    load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
+    return (
+        os.getenv("NILLION_CLUSTER_ID"),
+        os.getenv("NILLION_NILCHAIN_GRPC"),
+        os.getenv("NILLION_NILCHAIN_CHAIN_ID"),
+    )
+
+
+@dataclass
+class NillionConfig:
+    cluster_id: str
+    grpc_endpoint: str
+    chain_id: str
+    program_name: str = 'ticket_check'
+    seed: str = "seed"
+    # Which NILLION_NILCHAIN_PRIVATE_KEY_<n> pays; processes paying concurrently need different keys
+    key_index: int = 0
+
+    @classmethod
+    def from_env(cls):
+        cluster_id, grpc_endpoint, chain_id = load_env()
+        return cls(
+            cluster_id=cluster_id,
+            grpc_endpoint=grpc_endpoint,
+            chain_id=chain_id,
+            key_index=int(os.getenv("NILLION_NILCHAIN_KEY_INDEX", "0"))
+        )
+
+
+def data_path(name):
+    """Path of a file the service writes; the devnet config directory is mounted read-only in docker"""
+    home = os.getenv("HOME")
+    return os.path.join(os.getenv("TICKET_DATA_DIR", f"{home}/.local/share/nillion-tickets"), name)
+
+
+def private_key_count():
+    """Number of funded NILLION_NILCHAIN_PRIVATE_KEY_0..N keys, stopping at the first missing index"""
+    load_env()
+    count = 0
+    while os.getenv(f"{PRIVATE_KEY_PREFIX}{count}"):
+        count += 1
+    return count
+
+
+class Network:
+    """Payments and compute events outside a NillionClient; fake_nillion supplies an in-memory one"""
+
+    def ledger_client(self, config: NillionConfig):
+        from cosmpy.aerial.client import LedgerClient
+        from nillion_python_helpers import create_payments_config
+        return LedgerClient(create_payments_config(config.chain_id, config.grpc_endpoint))
+
+    async def quote_and_pay(self, client, operation, payments_wallet, payments_client, cluster_id):
+        from nillion_python_helpers import get_quote_and_pay as quote_and_pay
+        return await quote_and_pay(client, operation, payments_wallet, payments_client, cluster_id)
+
+    def broadcast(self, payments_client, quotes, address, wallet, account, gas_limit, memo):
+        """Submit one transaction paying for every quote in `quotes` from `wallet`"""
+        import py_nillion_client as nillion
+        from cosmpy.aerial.client.utils import prepare_and_broadcast_basic_transaction
+        from cosmpy.aerial.tx import Transaction
+        tx = Transaction()
+        for quote in quotes:
+            tx.add_message(nillion.create_payments_message(quote, address))
+        return prepare_and_broadcast_basic_transaction(
+            payments_client,
+            tx,
+            wallet,
+            account=account,
+            gas_limit=gas_limit,
+            memo=memo,
+        )
+
+    def receipt(self, quote, tx_hash):
+        import py_nillion_client as nillion
+        return nillion.PaymentReceipt(quote, tx_hash)
+
+    def compute_finished(self, event):
+        import py_nillion_client as nillion
+        return isinstance(event, nillion.ComputeFinishedEvent)
+
+
+network = Network()
+
+
+def use_network(replacement: Network) -> Network:
+    """Send payments and read compute events through `replacement`; returns the network it replaced"""
+    global network
+    previous, network = network, replacement
+    return previous
+
+
+def create_payments(config: NillionConfig):
+    """Ledger client and the NILLION_NILCHAIN_PRIVATE_KEY_<key_index> wallet that pays for operations"""
+    from cosmpy.aerial.wallet import LocalWallet
+    from cosmpy.crypto.keypairs import PrivateKey
+
+    payments_client = network.ledger_client(config)
+    payments_wallet = LocalWallet(
+        PrivateKey(bytes.fromhex(os.getenv(f"{PRIVATE_KEY_PREFIX}{config.key_index}"))),
+        prefix="nillion",
+    )
+    return payments_client, payments_wallet
+
+
+async def get_quote_and_pay(client, operation, payments_wallet, payments_client, cluster_id):
+    """nillion_python_helpers.get_quote_and_pay, imported on the first payment"""
+    from metrics import timed
+    with timed('get_quote_and_pay'):
+        return await network.quote_and_pay(client, operation, payments_wallet, payments_client, cluster_id)
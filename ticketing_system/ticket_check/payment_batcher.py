@@ -0,0 +1,95 @@
+import asyncio
+import threading
+
+import nillion_config
+from metrics import timed
+
+
+class PaymentBatcher:
+    """Pays for every quote that arrives within a short window with one multi-message nilchain transaction"""
+
+    def __init__(self, wallet_pool, cluster_id, window=0.025, max_batch=32,
+                 gas_limit=1000000, gas_per_message=100000):
+        self.wallet_pool = wallet_pool
+        self.cluster_id = cluster_id
+        self.window = window
+        self.max_batch = max_batch
+        self.gas_limit = gas_limit
+        self.gas_per_message = gas_per_message
+        self.batches = 0
+        self.payments = 0
+        # Batches are broadcast from worker threads, so their counters are updated under this lock
+        self._lock = threading.Lock()
+        self._pending = []
+        self._flush_handle = None
+        # Broadcast tasks are kept so they are not garbage-collected mid-flight and can be awaited on close
+        self._sending = set()
+
+    async def pay(self, client, operation, payments_wallet=None, payments_client=None, cluster_id=None):
+        """Drop-in for get_quote_and_pay whose payment rides in the next batch transaction"""
+        with timed('get_quote_and_pay'):
+            quote = await client.request_price_quote(self.cluster_id, operation)
+            return await self.pay_quote(quote)
+
+    async def pay_quote(self, quote):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((quote, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._sending.add(task)
+            task.add_done_callback(self._sent)
+
+    def _sent(self, task):
+        self._sending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Payment batch failed: {str(task.exception())}")
+
+    async def close(self):
+        """Send the quotes still waiting for the window and wait for every batch in flight"""
+        self._flush()
+        await asyncio.gather(*list(self._sending), return_exceptions=True)
+
+    async def _send(self, batch):
+        try:
+            # Signing and chain confirmation block, so keep them off the event loop;
+            # batches on different wallets confirm in parallel
+            tx_hash = await asyncio.to_thread(self._broadcast, [quote for quote, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for quote, future in batch:
+            if not future.done():
+                future.set_result(nillion_config.network.receipt(quote, tx_hash))
+
+    def _broadcast(self, quotes):
+        tx_hash = self.wallet_pool.pay_quotes(
+            quotes,
+            gas_limit=self.gas_limit + self.gas_per_message * (len(quotes) - 1),
+        )
+        with self._lock:
+            self.batches += 1
+            self.payments += len(quotes)
+        print(f"Paid {len(quotes)} quotes in one transaction, tx hash {tx_hash}")
+        return tx_hash
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'payments': self.payments,
+            'payments_per_batch': self.payments / self.batches if self.batches else 0.0,
+        }
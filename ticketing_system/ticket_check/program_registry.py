@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+
+import py_nillion_client as nillion
+
+from nillion_config import data_path
+
+
+@lru_cache(maxsize=None)
+def _digest(path, mtime_ns, size):
+    with open(path, 'rb') as program_file:
+        return hashlib.sha256(program_file.read()).hexdigest()
+
+
+def program_digest(path):
+    """sha256 of a compiled .nada.bin, hashed again only when the file changes"""
+    stat = os.stat(path)
+    return _digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+def program_missing(error):
+    """Whether a compute failed because the cluster does not have the program, e.g. after a devnet reset"""
+    return isinstance(error, nillion.ProgramError) or (
+        isinstance(error, nillion.ComputeError) and "program not found" in str(error).lower()
+    )
+
+
+class ProgramRegistry:
+    """Persistent map of (program hash, cluster_id, owner user_id) -> program_id for programs already stored"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("TICKET_PROGRAM_REGISTRY", data_path("ticket_programs.json"))
+        self._lock = threading.Lock()
+        self._programs = None
+
+    def _load(self):
+        if self._programs is None:
+            try:
+                with open(self.path) as registry_file:
+                    self._programs = json.load(registry_file)
+            except FileNotFoundError:
+                self._programs = {}
+        return self._programs
+
+    def _save(self):
+        # The in-memory entries stay authoritative for this process, so a failed write never
+        # makes it pay for a program it already stored
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as registry_file:
+                json.dump(self._programs, registry_file, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save the program registry to {self.path}: {str(e)}")
+
+    @staticmethod
+    def _key(digest, cluster_id, user_id):
+        return f"{cluster_id}/{user_id}/{digest}"
+
+    def lookup(self, digest, cluster_id, user_id):
+        with self._lock:
+            return self._load().get(self._key(digest, cluster_id, user_id))
+
+    def record(self, digest, cluster_id, user_id, program_id):
+        with self._lock:
+            self._load()[self._key(digest, cluster_id, user_id)] = program_id
+            self._save()
+
+    def forget_one(self, digest, cluster_id, user_id):
+        with self._lock:
+            if self._load().pop(self._key(digest, cluster_id, user_id), None) is not None:
+                self._save()
+
+    def forget(self, cluster_id):
+        """Drop every entry for a cluster, e.g. after a devnet restart wiped its programs"""
+        with self._lock:
+            programs = self._load()
+            for key in [key for key in programs if key.startswith(f"{cluster_id}/")]:
+                del programs[key]
+            self._save()
+
+
+registry = ProgramRegistry()
+
+
+def use_registry(replacement: ProgramRegistry) -> ProgramRegistry:
+    """Record stored programs in `replacement`; returns the registry it replaced"""
+    global registry
+    previous, registry = registry, replacement
+    return previous
+
+
+def deployed_program_id(program_path, cluster_id, user_id):
+    return registry.lookup(program_digest(program_path), cluster_id, user_id)
+
+
+def record_program(program_path, cluster_id, user_id, program_id):
+    registry.record(program_digest(program_path), cluster_id, user_id, program_id)
+
+
+def forget_program(program_path, cluster_id, user_id):
+    registry.forget_one(program_digest(program_path), cluster_id, user_id)
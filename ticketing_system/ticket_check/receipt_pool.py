@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import deque
+
+from metrics import timed
+
+
+class ReceiptPool:
+    """Prepaid payment receipts per operation shape, topped up by a background task"""
+
+    def __init__(self, pay_quote, cluster_id, size=2, expiry_margin=30, refill_interval=5):
+        # pay_quote(quote) -> PaymentReceipt; receipts are bought from quotes for a template operation
+        self.pay_quote = pay_quote
+        self.cluster_id = cluster_id
+        self.size = size
+        self.expiry_margin = expiry_margin
+        self.refill_interval = refill_interval
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.rejected = 0
+        self.refilled = 0
+        self._shapes = {}
+        self._receipts = {}
+        self._wanted = asyncio.Event()
+        self._task = None
+
+    def register(self, shape, client, operation):
+        """Keep receipts for `operation` (a template with the right value names and types) bought by `client`"""
+        self._shapes[shape] = (client, operation)
+        self._receipts.setdefault(shape, deque())
+
+    def _discard_expired(self, shape):
+        receipts = self._receipts[shape]
+        deadline = time.time() + self.expiry_margin
+        while receipts and receipts[0][0] < deadline:
+            receipts.popleft()
+            self.expired += 1
+
+    def take(self, shape):
+        """A ready receipt for `shape`, or None when the pool is empty"""
+        self._wanted.set()
+        if shape not in self._receipts:
+            self.misses += 1
+            return None
+        self._discard_expired(shape)
+        if not self._receipts[shape]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._receipts[shape].popleft()[1]
+
+    def reject(self, shape):
+        """Count a pooled receipt for `shape` that the network refused, e.g. one that expired in flight"""
+        self.rejected += 1
+        print(f"A pooled {shape} receipt was rejected, paying inline")
+
+    def payer(self, shape, fallback):
+        """A get_quote_and_pay-compatible callable that serves pooled receipts and pays inline on a miss"""
+        return _PooledPayer(self, shape, fallback)
+
+    async def refill(self):
+        for shape, (client, operation) in self._shapes.items():
+            self._discard_expired(shape)
+            missing = self.size - len(self._receipts[shape])
+            if missing <= 0:
+                continue
+            # Pay for the whole shortfall at once so the payments can share a transaction
+            quotes = await asyncio.gather(*[
+                client.request_price_quote(self.cluster_id, operation) for _ in range(missing)
+            ])
+            receipts = await asyncio.gather(*[self.pay_quote(quote) for quote in quotes])
+            for quote, receipt in zip(quotes, receipts):
+                self._receipts[shape].append((quote.expires_at, receipt))
+            self.refilled += missing
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refill()
+            except Exception as e:
+                print(f"Receipt pool refill failed: {str(e)}")
+            self._wanted.clear()
+            try:
+                await asyncio.wait_for(self._wanted.wait(), self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None and self.size > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'available': {shape: len(receipts) for shape, receipts in self._receipts.items()},
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'rejected': self.rejected,
+            'refilled': self.refilled,
+        }
+
+
+class _PooledPayer:
+    def __init__(self, pool, shape, fallback):
+        self.pool = pool
+        self.shape = shape
+        self.fallback = fallback
+        self.used_pooled = False
+
+    async def __call__(self, client, operation, payments_wallet, payments_client, cluster_id):
+        # Timed apart from get_quote_and_pay, which the fallback records, so pool hits do not hide payment latency
+        with timed('receipt_pool_take'):
+            receipt = self.pool.take(self.shape)
+        if receipt is not None:
+            self.used_pooled = True
+            return receipt
+        return await self.fallback(client, operation, payments_wallet, payments_client, cluster_id)
@@ -0,0 +1,133 @@
+import asyncio
+
+# ticket_check status for the right holder's claim on a ticket that is already redeemed
+REDEEMED = 2
+
+
+class RedemptionWriter:
+    """Marks verified tickets redeemed in their issuer stores, batching the updates off the scan path"""
+
+    def __init__(self, write, window=0.25, max_batch=32, max_attempts=5, backoff=0.5, give_up=None):
+        # write(key, ticket) updates one issuer store; `ticket` is its ticket index row
+        self.write = write
+        self.window = window
+        self.max_batch = max_batch
+        # A failed write is retried after backoff, 2 * backoff, ... seconds, up to max_attempts in all
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        # give_up(key, ticket) is awaited when a write has used up its attempts
+        self.give_up = give_up
+        self.flushes = 0
+        self.written = 0
+        self.retries = 0
+        # Redemption key -> ticket, until the update lands; scans check this before computing
+        self._pending = {}
+        self._attempts = {}
+        # Writes that used up their attempts; their tickets are still turned down until a restart retries them
+        self._failed = {}
+        self._queued = []
+        self._flush_handle = None
+        self._retry_handles = set()
+        self._writing = set()
+        self._in_write = set()
+
+    def pending(self, key):
+        return key in self._pending or key in self._failed
+
+    def mark(self, key, ticket):
+        """Queue `key` for write-back; returns False when it is already pending"""
+        if self.pending(key):
+            return False
+        self._pending[key] = ticket
+        self._queue(key)
+        return True
+
+    def _queue(self, key):
+        self._queued.append(key)
+        if len(self._queued) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _retry(self, key):
+        def requeue():
+            self._retry_handles.discard(handle)
+            self._queue(key)
+
+        delay = self.backoff * 2 ** (self._attempts[key] - 1)
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._retry_handles.add(handle)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queued = self._queued, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._write_batch(batch))
+            self._writing.add(task)
+            task.add_done_callback(self._writing.discard)
+
+    async def _write_batch(self, batch):
+        # Started together, so their payments share the payment batcher's transaction
+        self._in_write.update(batch)
+        try:
+            results = await asyncio.gather(
+                *(self.write(key, self._pending[key]) for key in batch),
+                return_exceptions=True
+            )
+        finally:
+            self._in_write.difference_update(batch)
+        self.flushes += 1
+        for key, result in zip(batch, results):
+            if not isinstance(result, Exception):
+                self._pending.pop(key, None)
+                self._attempts.pop(key, None)
+                self.written += 1
+                continue
+
+            attempts = self._attempts[key] = self._attempts.get(key, 0) + 1
+            if attempts < self.max_attempts:
+                # Stays pending, so rescans are still rejected
+                self.retries += 1
+                print(f"Marking {key} redeemed failed (attempt {attempts}/{self.max_attempts}): {str(result)}")
+                self._retry(key)
+                continue
+
+            ticket = self._failed[key] = self._pending.pop(key)
+            self._attempts.pop(key, None)
+            print(f"Giving up marking {key} redeemed after {attempts} attempts: {str(result)}")
+            if self.give_up is not None:
+                try:
+                    await self.give_up(key, ticket)
+                except Exception as e:
+                    print(f"Recording the failed redemption of {key} failed: {str(e)}")
+
+    async def close(self):
+        """Write everything still pending before the service shuts down, with one more attempt each"""
+        self._cancel_retries()
+        # Writes waiting out a backoff get their last attempt now
+        self._queued.extend(key for key in self._pending if key not in self._queued and key not in self._in_write)
+        self._flush()
+        await asyncio.gather(*list(self._writing), return_exceptions=True)
+        self._cancel_retries()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        unwritten = [*self._pending, *self._failed]
+        if unwritten:
+            print(f"{len(unwritten)} tickets were not marked redeemed: {', '.join(map(str, unwritten))}")
+
+    def _cancel_retries(self):
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'flushes': self.flushes,
+            'written': self.written,
+            'retries': self.retries,
+            'failed': len(self._failed),
+        }
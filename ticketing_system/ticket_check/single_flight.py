@@ -0,0 +1,43 @@
+import asyncio
+
+
+class SingleFlight:
+    """Runs at most one operation per key at a time; concurrent callers with the same key share its outcome"""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight = {}
+
+    def _done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def run(self, key, operation, follow=None):
+        """Result of `operation()`, or of the identical operation already in flight for `key`
+
+        `follow(result)`, when given, is what callers that joined an operation already in flight get
+        instead, e.g. when only the caller that started it may act on the result.
+        """
+        task = self._in_flight.get(key)
+        leader = task is None
+        if leader:
+            self.calls += 1
+            task = asyncio.get_running_loop().create_task(operation())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._done(key, done))
+        else:
+            self.coalesced += 1
+        # One impatient caller giving up must not cancel the work the others are waiting on
+        result = await asyncio.shield(task)
+        return result if leader or follow is None else follow(result)
+
+    def stats(self):
+        return {
+            'in_flight': len(self._in_flight),
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+        }
@@ -0,0 +1,86 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+import ticket_api
+from ticket_service import TicketService
+
+
+@pytest.fixture
+def app_module(fake_cluster, monkeypatch):
+    """Import an app module against the fake cluster, and forget it afterwards"""
+    monkeypatch.setenv("NILLION_FAKE_CLUSTER", "1")
+    imported = []
+
+    def load(name):
+        imported.append(name)
+        return importlib.import_module(name)
+
+    yield load
+    for name in imported:
+        sys.modules.pop(name, None)
+
+
+def call(service, rule, data=None, **params):
+    route = next(route for route in ticket_api.ROUTES if route.rule == rule)
+    return asyncio.run(ticket_api.respond(route, service, data, **params))
+
+
+def test_handlers_shape_service_results_and_errors(fake_cluster):
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            routes = {route.rule: route for route in ticket_api.ROUTES}
+            issued = await ticket_api.respond(routes['/api/initial'], service, {'ticket_id': 7, 'ticket_owner': 70})
+            scanned = await ticket_api.respond(routes['/api/scan'], service, {'ticket_id': 7, 'wallet_id': 70})
+            found = await ticket_api.respond(routes['/api/tickets/<ticket_id>'], service, None, ticket_id="7")
+            missing = await ticket_api.respond(routes['/api/tickets/<ticket_id>'], service, None, ticket_id="8")
+            unknown = await ticket_api.respond(routes['/api/scan'], service, {'ticket_id': 8, 'wallet_id': 80})
+            no_body = await ticket_api.respond(routes['/api/redeem'], service, None)
+            return issued, scanned, found, missing, unknown, no_body
+        finally:
+            await service.close()
+
+    issued, scanned, found, missing, unknown, no_body = asyncio.run(scenario())
+    assert issued[1] == 200 and issued[0]['status'] == 'success'
+    assert issued[0]['cmd'] == 'python3 01_server_initial_data_set.py --ticket_id 7 --ticket_owner 70 --is_redeemed 0'
+    assert scanned == ({'status': 'success', 'result': {'status': 1}, 'store_id': issued[0]['store_id']}, 200)
+    assert found[0]['ticket']['store_id'] == issued[0]['store_id']
+    assert missing == ({'status': 'error', 'message': "Unknown ticket 8"}, 404)
+    assert unknown[1] == 500 and unknown[0]['status'] == 'error'
+    assert no_body == ({'status': 'error', 'message': "Expected a JSON request body"}, 500)
+
+
+def test_flask_app_serves_every_api_route(app_module):
+    flask_app = app_module('flask_app')
+    rules = {rule.rule for rule in flask_app.app.url_map.iter_rules()}
+    assert {route.rule for route in ticket_api.ROUTES} <= rules
+
+    client = flask_app.app.test_client()
+    issued = client.post('/api/initial', json={'ticket_id': 3, 'ticket_owner': 30})
+    ticket = client.get('/api/tickets/3')
+
+    assert issued.status_code == 200
+    assert ticket.get_json()['ticket']['store_id'] == issued.get_json()['store_id']
+    assert client.get('/api/tickets/4').status_code == 404
+    flask_app.loop_thread.run(flask_app.service.close())
+
+
+def test_async_app_serves_every_api_route(app_module):
+    async_app = app_module('async_app')
+
+    async def scenario():
+        async with async_app.app.test_app() as test_app:
+            client = test_app.test_client()
+            issued = await client.post('/api/initial', json={'ticket_id': 3, 'ticket_owner': 30})
+            ticket = await client.get('/api/tickets/3')
+            missing = await client.get('/api/tickets/4')
+            return issued.status_code, await issued.get_json(), await ticket.get_json(), missing.status_code
+
+    status, issued, ticket, missing = asyncio.run(scenario())
+    assert status == 200
+    assert ticket['ticket']['store_id'] == issued['store_id']
+    assert missing == 404
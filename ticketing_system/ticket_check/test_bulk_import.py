@@ -0,0 +1,81 @@
+import asyncio
+import json
+
+import bulk_import
+from ticket_service import TicketService
+
+
+def write_jsonl(path, tickets):
+    path.write_text(''.join(json.dumps(ticket) + '\n' for ticket in tickets))
+    return str(path)
+
+
+def run_import(input_path, checkpoint_path, book_width=0):
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            return await bulk_import.import_tickets(service, input_path, checkpoint_path, 4, 60, book_width)
+        finally:
+            await service.close()
+
+    return asyncio.run(scenario())
+
+
+def checkpointed(path):
+    with open(path) as checkpoint_file:
+        return [json.loads(line) for line in checkpoint_file]
+
+
+REPEATED_ROWS = [
+    {'ticket_id': 1, 'ticket_owner': 10},
+    {'ticket_id': 2, 'ticket_owner': 20},
+    {'ticket_id': 1, 'ticket_owner': 11},
+    {'ticket_id': 3, 'ticket_owner': 30},
+]
+
+
+def test_repeated_ticket_ids_are_issued_once_and_counted_as_skipped(fake_cluster, tmp_path):
+    input_path = write_jsonl(tmp_path / "tickets.jsonl", REPEATED_ROWS)
+    checkpoint_path = str(tmp_path / "tickets.checkpoint.jsonl")
+
+    progress = run_import(input_path, checkpoint_path)
+
+    assert (progress.total, progress.completed, progress.skipped, progress.failed) == (4, 3, 1, 0)
+    assert [entry['ticket_id'] for entry in checkpointed(checkpoint_path)].count(1) == 1
+    assert len(fake_cluster.stores) == 3
+
+
+def test_repeated_ticket_ids_take_one_book_slot(batch_programs, tmp_path):
+    input_path = write_jsonl(tmp_path / "tickets.jsonl", REPEATED_ROWS)
+    checkpoint_path = str(tmp_path / "tickets.checkpoint.jsonl")
+
+    progress = run_import(input_path, checkpoint_path, book_width=8)
+
+    assert (progress.total, progress.completed, progress.skipped, progress.failed) == (4, 3, 1, 0)
+    assert [entry['slot'] for entry in checkpointed(checkpoint_path)] == [0, 1, 2]
+
+
+def test_resume_skips_checkpointed_tickets_without_paying_again(fake_cluster, tmp_path):
+    input_path = write_jsonl(tmp_path / "tickets.jsonl", [{'ticket_id': i, 'ticket_owner': i * 10} for i in range(1, 6)])
+    checkpoint_path = str(tmp_path / "tickets.checkpoint.jsonl")
+    with open(checkpoint_path, 'w') as checkpoint_file:
+        checkpoint_file.write(json.dumps({'ticket_id': 1, 'store_id': 'earlier-run'}) + '\n')
+        checkpoint_file.write(json.dumps({'ticket_id': 2, 'store_id': 'earlier-run'}) + '\n')
+
+    progress = run_import(input_path, checkpoint_path)
+
+    assert (progress.completed, progress.skipped, progress.failed) == (3, 2, 0)
+    assert sorted(entry['ticket_id'] for entry in checkpointed(checkpoint_path)) == [1, 2, 3, 4, 5]
+    assert len(fake_cluster.stores) == 3
+
+
+def test_failed_stores_are_counted_and_left_out_of_the_checkpoint(fake_cluster, tmp_path):
+    input_path = write_jsonl(tmp_path / "tickets.jsonl", [{'ticket_id': i, 'ticket_owner': i * 10} for i in range(1, 4)])
+    checkpoint_path = str(tmp_path / "tickets.checkpoint.jsonl")
+    fake_cluster.failure_rate = {'store_values': 1.0}
+
+    progress = run_import(input_path, checkpoint_path)
+
+    assert (progress.completed, progress.skipped, progress.failed) == (0, 0, 3)
+    assert checkpointed(checkpoint_path) == []
@@ -0,0 +1,29 @@
+from client_registry import ClientRegistry
+
+
+def test_client_registry_reuses_and_evicts_least_recently_used():
+    built = []
+    evicted = []
+    registry = ClientRegistry(maxsize=2, factory=lambda seed: built.append(seed) or object())
+    registry.on_evict.append(evicted.append)
+
+    first = registry.get("a", "cluster")
+    assert registry.get("a", "cluster") is first
+    registry.get("b", "cluster")
+    registry.get("a", "cluster")
+    registry.get("c", "cluster")
+
+    assert built == ["a", "b", "c"]
+    assert len(evicted) == 1
+    assert registry.stats()['evictions'] == 1
+    # "a" was used after "b", so "b" went
+    assert registry.get("a", "cluster") is first
+    registry.get("b", "cluster")
+    assert built == ["a", "b", "c", "b"]
+
+
+def test_client_registry_clear_rebuilds_clients():
+    registry = ClientRegistry(factory=lambda seed: object())
+    first = registry.get("a", "cluster")
+    registry.clear()
+    assert registry.get("a", "cluster") is not first
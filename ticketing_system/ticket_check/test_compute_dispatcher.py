@@ -0,0 +1,124 @@
+import asyncio
+import uuid
+
+import py_nillion_client as nillion
+import pytest
+
+import compute_dispatcher
+from compute_dispatcher import ComputeDispatcher
+from fake_nillion import FakeComputeFinishedEvent
+
+pytestmark = pytest.mark.usefixtures("fake_cluster")
+
+
+class ScriptedClient:
+    """Compute event stream that yields whatever the test puts on it"""
+
+    def __init__(self):
+        self.events = asyncio.Queue()
+
+    async def next_compute_event(self):
+        event = await self.events.get()
+        if isinstance(event, Exception):
+            raise event
+        return event
+
+
+def test_results_reach_their_own_waiter_in_any_order():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = ComputeDispatcher(client)
+        first, second = str(uuid.uuid4()), str(uuid.uuid4())
+        waits = asyncio.gather(dispatcher.wait(first), dispatcher.wait(second))
+        await client.events.put(FakeComputeFinishedEvent(second, {'status': 0}))
+        await client.events.put(FakeComputeFinishedEvent(first, {'status': 1}))
+        try:
+            return await waits
+        finally:
+            dispatcher.close()
+
+    assert asyncio.run(scenario()) == [{'status': 1}, {'status': 0}]
+
+
+def test_result_that_finishes_before_its_wait_is_kept():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = ComputeDispatcher(client)
+        early, late = str(uuid.uuid4()), str(uuid.uuid4())
+        await client.events.put(FakeComputeFinishedEvent(early, {'status': 1}))
+        await client.events.put(FakeComputeFinishedEvent(late, {'status': 0}))
+        try:
+            # Waiting for `late` starts the reader, which sets `early` aside
+            late_result = await dispatcher.wait(late)
+            return await dispatcher.wait(early), late_result
+        finally:
+            dispatcher.close()
+
+    assert asyncio.run(scenario()) == ({'status': 1}, {'status': 0})
+
+
+def test_compute_error_fails_only_the_compute_it_names():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = ComputeDispatcher(client)
+        failed, ok = str(uuid.uuid4()), str(uuid.uuid4())
+        waits = asyncio.gather(dispatcher.wait(failed), dispatcher.wait(ok), return_exceptions=True)
+        await client.events.put(nillion.ComputeError(f"compute {failed} failed: out of memory"))
+        await client.events.put(FakeComputeFinishedEvent(ok, {'status': 1}))
+        try:
+            return await waits
+        finally:
+            dispatcher.close()
+
+    failed_result, ok_result = asyncio.run(scenario())
+    assert isinstance(failed_result, nillion.ComputeError)
+    assert ok_result == {'status': 1}
+
+
+def test_broken_stream_fails_every_waiter_then_stops():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = compute_dispatcher.dispatcher_for(client)
+        dispatcher.backoff = 0.001
+        dispatcher.max_failures = 3
+        for _ in range(3):
+            await client.events.put(ConnectionError("stream closed"))
+        result = await asyncio.gather(dispatcher.wait(str(uuid.uuid4())), return_exceptions=True)
+        await asyncio.wait_for(dispatcher._task, 1)
+        return result[0], compute_dispatcher.dispatcher_for(client) is dispatcher
+
+    error, same_dispatcher = asyncio.run(scenario())
+    assert isinstance(error, ConnectionError)
+    # The stopped dispatcher was dropped, so the next wait gets a fresh one
+    assert not same_dispatcher
+
+
+def test_stream_recovers_after_a_break():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = ComputeDispatcher(client, backoff=0.001)
+        await client.events.put(ConnectionError("stream closed"))
+        lost = await asyncio.gather(dispatcher.wait(str(uuid.uuid4())), return_exceptions=True)
+        compute_id = str(uuid.uuid4())
+        await client.events.put(FakeComputeFinishedEvent(compute_id, {'status': 1}))
+        try:
+            return lost[0], await asyncio.wait_for(dispatcher.wait(compute_id), 1)
+        finally:
+            dispatcher.close()
+
+    lost, result = asyncio.run(scenario())
+    assert isinstance(lost, ConnectionError)
+    assert result == {'status': 1}
+
+
+def test_evicting_the_client_fails_computes_still_being_waited_on():
+    async def scenario():
+        client = ScriptedClient()
+        dispatcher = compute_dispatcher.dispatcher_for(client)
+        waiting = asyncio.create_task(dispatcher.wait(str(uuid.uuid4())))
+        await asyncio.sleep(0)
+        compute_dispatcher._discard(client)
+        return await asyncio.gather(asyncio.wait_for(waiting, 1), return_exceptions=True)
+
+    error, = asyncio.run(scenario())
+    assert isinstance(error, RuntimeError)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+import metrics
+from metrics import Metrics, flatten
+from ticket_service import TicketService
+
+
+def sample(rendered, line_start):
+    return next(float(line.split()[-1]) for line in rendered.splitlines() if line.startswith(line_start))
+
+
+def test_buckets_are_rendered_cumulatively():
+    stage_metrics = Metrics(buckets=(0.01, 0.1))
+    histogram = stage_metrics.histogram('compute')
+    for seconds in (0.005, 0.05, 0.05, 5):
+        histogram.observe(seconds)
+
+    rendered = stage_metrics.render()
+
+    assert sample(rendered, 'ticket_stage_seconds_bucket{stage="compute",le="0.01"}') == 1
+    assert sample(rendered, 'ticket_stage_seconds_bucket{stage="compute",le="0.1"}') == 3
+    assert sample(rendered, 'ticket_stage_seconds_bucket{stage="compute",le="+Inf"}') == 4
+    assert sample(rendered, 'ticket_stage_seconds_count{stage="compute"}') == 4
+    assert sample(rendered, 'ticket_stage_seconds_sum{stage="compute"}') == pytest.approx(5.105)
+
+
+def test_timed_blocks_are_counted_and_those_that_raise_are_errors():
+    stage_metrics = Metrics()
+
+    async def stored():
+        with stage_metrics.timed('store_values'):
+            await asyncio.sleep(0)
+
+    asyncio.run(stored())
+    with pytest.raises(RuntimeError):
+        with stage_metrics.timed('store_values'):
+            raise RuntimeError("cluster unavailable")
+
+    rendered = stage_metrics.render()
+    assert sample(rendered, 'ticket_stage_seconds_count{stage="store_values"}') == 2
+    assert sample(rendered, 'ticket_stage_errors_total{stage="store_values"}') == 1
+
+
+def test_gauges_are_the_numeric_leaves_of_the_stats():
+    gauges = flatten({'receipts': {'size': 3, 'shapes': {'store': 2}}, 'wallets': {'in_flight': [0, 1]},
+                      'redemptions': {'pending': 0, 'closing': True}})
+
+    assert gauges == {'ticket_receipts_size': 3, 'ticket_receipts_shapes_store': 2, 'ticket_redemptions_pending': 0}
+
+
+def test_a_served_ticket_shows_up_in_the_rendered_metrics(fake_cluster, monkeypatch):
+    monkeypatch.setattr(metrics, 'metrics', Metrics())
+
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            await service.issue_ticket(2, 20)
+            await service.scan_ticket(2, 20)
+            return metrics.metrics.render(service.stats())
+        finally:
+            await service.close()
+
+    rendered = asyncio.run(scenario())
+
+    assert sample(rendered, 'ticket_stage_seconds_count{stage="store_values"}') == 1
+    assert sample(rendered, 'ticket_stage_seconds_count{stage="compute"}') >= 1
+    assert sample(rendered, 'ticket_verify_cache_misses ') == 1
+    assert sample(rendered, 'ticket_in_flight_calls ') == 1
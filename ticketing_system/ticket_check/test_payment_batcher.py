@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from cosmpy.aerial.exceptions import BroadcastError
+from cosmpy.aerial.wallet import LocalWallet
+from cosmpy.crypto.keypairs import PrivateKey
+
+from payment_batcher import PaymentBatcher
+from wallet_pool import WalletPool
+
+
+def new_batcher(cluster, **kwargs):
+    pool = WalletPool(cluster.ledger, [LocalWallet(PrivateKey(), prefix="nillion")])
+    return PaymentBatcher(pool, "fake-cluster", **kwargs)
+
+
+def test_quotes_in_one_window_share_a_transaction(fake_cluster):
+    async def scenario():
+        batcher = new_batcher(fake_cluster, window=0.01)
+        receipts = await asyncio.gather(*(batcher.pay_quote(fake_cluster.quote()) for _ in range(5)))
+        return batcher, receipts
+
+    batcher, receipts = asyncio.run(scenario())
+    assert batcher.stats()['batches'] == 1
+    assert batcher.stats()['payments'] == 5
+    assert len({receipt.tx_hash for receipt in receipts}) == 1
+    assert fake_cluster.ledger.transactions == 1
+    for receipt in receipts:
+        fake_cluster.spend(receipt)
+
+
+def test_full_batches_are_sent_without_waiting_for_the_window(fake_cluster):
+    async def scenario():
+        batcher = new_batcher(fake_cluster, window=60, max_batch=2)
+        receipts = await asyncio.wait_for(
+            asyncio.gather(*(batcher.pay_quote(fake_cluster.quote()) for _ in range(4))), 5
+        )
+        return batcher, receipts
+
+    batcher, receipts = asyncio.run(scenario())
+    assert batcher.stats()['batches'] == 2
+    assert batcher.stats()['payments_per_batch'] == 2
+
+
+def test_close_sends_quotes_still_waiting_for_the_window(fake_cluster):
+    async def scenario():
+        batcher = new_batcher(fake_cluster, window=60)
+        payment = asyncio.create_task(batcher.pay_quote(fake_cluster.quote()))
+        await asyncio.sleep(0)
+        await batcher.close()
+        return await payment
+
+    fake_cluster.spend(asyncio.run(scenario()))
+
+
+def test_a_failed_broadcast_fails_every_payment_in_it(fake_cluster):
+    fake_cluster.failure_rate = {'broadcast': 1.0}
+
+    async def scenario():
+        batcher = new_batcher(fake_cluster, window=0.01)
+        return await asyncio.gather(
+            *(batcher.pay_quote(fake_cluster.quote()) for _ in range(3)), return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, BroadcastError) for result in results)
+
+
+def test_pay_requests_the_quote_itself(fake_cluster):
+    async def scenario():
+        batcher = new_batcher(fake_cluster, window=0.01)
+        return await batcher.pay(fake_cluster.client("issuer"), None)
+
+    fake_cluster.spend(asyncio.run(scenario()))
+    assert fake_cluster.calls['quote'] == 1
+
+
+@pytest.mark.parametrize("quotes", [1, 3])
+def test_gas_grows_with_the_batch(fake_cluster, quotes):
+    batcher = new_batcher(fake_cluster)
+    seen = []
+    batcher.wallet_pool.pay_quotes = lambda batch, gas_limit: seen.append(gas_limit) or "TX"
+
+    batcher._broadcast([fake_cluster.quote() for _ in range(quotes)])
+
+    assert seen == [batcher.gas_limit + batcher.gas_per_message * (quotes - 1)]
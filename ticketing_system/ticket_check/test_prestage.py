@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from ticket_service import TicketService
+
+
+@pytest.fixture(autouse=True)
+def quick_write_back(monkeypatch):
+    monkeypatch.setenv("TICKET_REDEEM_FLUSH_MS", "1")
+
+
+def run(scenario):
+    async def with_service():
+        service = TicketService()
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+
+    return asyncio.run(with_service())
+
+
+def test_a_prestaged_ticket_costs_one_compute_at_the_gate(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(6, 60)
+        staged = await service.prestage_ticket(6, 60)
+        stores = fake_cluster.calls['store_values']
+        gate = await service.gate_scan(6, 60)
+        return staged, stores, gate
+
+    staged, stores_before_gate, gate = run(scenario)
+
+    assert gate['prestaged'] is True
+    assert gate['result'] == {'status': 1}
+    assert gate['store_id'] == staged['store_id']
+    assert fake_cluster.calls['store_values'] == stores_before_gate
+    assert fake_cluster.calls['compute'] == 1
+
+
+def test_prestaging_again_from_the_same_wallet_reuses_the_claim(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(6, 60)
+        first = await service.prestage_ticket(6, 60)
+        stores = fake_cluster.calls['store_values']
+        return first, stores, await service.prestage_ticket(6, 60)
+
+    first, stores, second = run(scenario)
+
+    assert second == first
+    assert fake_cluster.calls['store_values'] == stores
+
+
+def test_the_gate_checks_the_claim_directly_when_nothing_was_staged(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(6, 60)
+        return await service.gate_scan(6, 60)
+
+    gate = run(scenario)
+
+    assert gate['prestaged'] is False
+    assert gate['result'] == {'status': 1}
+    # Issuer store only
+    assert fake_cluster.calls['store_values'] == 1
+
+
+def test_a_claim_staged_by_another_wallet_is_not_used_at_the_gate(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(6, 60)
+        await service.prestage_ticket(6, 61)
+        return await service.gate_scan(6, 60)
+
+    gate = run(scenario)
+
+    assert gate['prestaged'] is False
+    assert gate['result'] == {'status': 1}
+
+
+def test_a_prestaged_ticket_gets_in_once(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(6, 60)
+        await service.prestage_ticket(6, 60)
+        first = await service.gate_scan(6, 60)
+        await asyncio.sleep(0.05)
+        return first, await service.gate_scan(6, 60)
+
+    first, second = run(scenario)
+
+    assert first['result'] == {'status': 1}
+    assert second['result'] == {'status': 2}
+    assert fake_cluster.calls['update_values'] == 1
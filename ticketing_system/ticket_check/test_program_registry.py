@@ -0,0 +1,80 @@
+import asyncio
+import program_registry
+from program_registry import ProgramRegistry, program_digest
+from ticket_service import TicketService
+
+
+def issue(tickets):
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            return [await service.issue_ticket(ticket_id, ticket_owner) for ticket_id, ticket_owner in tickets]
+        finally:
+            await service.close()
+
+    return asyncio.run(scenario())
+
+
+def test_a_stored_program_is_not_paid_for_again_after_a_restart(fake_cluster):
+    issue([(1, 10), (2, 20)])
+    # A new process reads the same registry file
+    program_registry.use_registry(ProgramRegistry(program_registry.registry.path))
+    issue([(3, 30)])
+
+    assert fake_cluster.calls['store_program'] == 1
+
+
+def test_an_edited_binary_gets_its_own_entry(tmp_path):
+    program_path = tmp_path / "ticket_check.nada.bin"
+    program_path.write_bytes(b"first build")
+    registry = ProgramRegistry(str(tmp_path / "ticket_programs.json"))
+    registry.record(program_digest(str(program_path)), "cluster", "user", "user/ticket_check")
+
+    program_path.write_bytes(b"second build, longer")
+
+    assert registry.lookup(program_digest(str(program_path)), "cluster", "user") is None
+
+
+def test_entries_are_per_cluster_and_forgotten_per_cluster(tmp_path):
+    registry = ProgramRegistry(str(tmp_path / "ticket_programs.json"))
+    registry.record("digest", "devnet", "user", "user/ticket_check")
+    registry.record("digest", "testnet", "user", "user/ticket_check")
+
+    registry.forget("devnet")
+
+    reloaded = ProgramRegistry(registry.path)
+    assert reloaded.lookup("digest", "devnet", "user") is None
+    assert reloaded.lookup("digest", "testnet", "user") == "user/ticket_check"
+
+
+def test_a_failed_save_keeps_the_entry_for_this_process(tmp_path, monkeypatch):
+    registry = ProgramRegistry(str(tmp_path / "ticket_programs.json"))
+
+    def disk_full(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(program_registry.os, "replace", disk_full)
+    registry.record("digest", "cluster", "user", "user/ticket_check")
+
+    assert registry.lookup("digest", "cluster", "user") == "user/ticket_check"
+    assert not (tmp_path / "ticket_programs.json").exists()
+
+
+def test_a_program_wiped_from_the_cluster_is_stored_again_once(fake_cluster):
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            issued = [await service.issue_ticket(ticket_id, ticket_id * 10) for ticket_id in (1, 2)]
+            # A devnet reset keeps the registry entry but drops the program
+            fake_cluster.programs.clear()
+            return await asyncio.gather(*(service.scan_ticket(ticket_id, ticket_id * 10, ticket['store_id'])
+                                          for ticket_id, ticket in zip((1, 2), issued)))
+        finally:
+            await service.close()
+
+    scans = asyncio.run(scenario())
+
+    assert [scan['result'] for scan in scans] == [{'status': 1}, {'status': 1}]
+    assert fake_cluster.calls['store_program'] == 2
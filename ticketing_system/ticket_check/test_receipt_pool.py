@@ -0,0 +1,109 @@
+import asyncio
+
+import py_nillion_client as nillion
+import pytest
+
+import nillion_config
+from metrics import metrics
+from nillion_config import get_quote_and_pay
+from receipt_pool import ReceiptPool
+
+
+async def pay_quote(quote):
+    return nillion_config.network.receipt(quote, "TX")
+
+
+def test_refill_tops_up_each_shape_and_take_serves_spendable_receipts(fake_cluster):
+    async def scenario():
+        pool = ReceiptPool(pay_quote, "fake-cluster", size=3)
+        pool.register('compute', fake_cluster.client("issuer"), None)
+        await pool.refill()
+        available = pool.stats()['available']['compute']
+        receipts = [pool.take('compute') for _ in range(4)]
+        return pool, available, receipts
+
+    pool, available, receipts = asyncio.run(scenario())
+    assert available == 3
+    assert receipts[3] is None
+    for receipt in receipts[:3]:
+        fake_cluster.spend(receipt)
+    assert pool.stats()['hits'] == 3
+    assert pool.stats()['misses'] == 1
+
+
+def test_receipts_too_close_to_expiry_are_discarded(fake_cluster):
+    async def scenario():
+        # Fake quotes expire in 600 seconds, inside this margin
+        pool = ReceiptPool(pay_quote, "fake-cluster", size=2, expiry_margin=601)
+        pool.register('compute', fake_cluster.client("issuer"), None)
+        await pool.refill()
+        return pool, pool.take('compute')
+
+    pool, receipt = asyncio.run(scenario())
+    assert receipt is None
+    assert pool.stats()['expired'] == 2
+
+
+def test_payer_falls_back_to_paying_inline_when_empty(fake_cluster):
+    async def scenario():
+        pool = ReceiptPool(pay_quote, "fake-cluster", size=1)
+        client = fake_cluster.client("issuer")
+        pool.register('compute', client, None)
+        await pool.refill()
+        fallback_calls = []
+
+        async def fallback(*args):
+            fallback_calls.append(args)
+            return await nillion_config.network.quote_and_pay(*args)
+
+        pooled = pool.payer('compute', fallback)
+        first = await pooled(client, None, None, None, "fake-cluster")
+        inline = pool.payer('compute', fallback)
+        second = await inline(client, None, None, None, "fake-cluster")
+        return pooled.used_pooled, inline.used_pooled, fallback_calls, first, second
+
+    used_first, used_second, fallback_calls, first, second = asyncio.run(scenario())
+    assert used_first and not used_second
+    assert len(fallback_calls) == 1
+    fake_cluster.spend(first)
+    fake_cluster.spend(second)
+
+
+def test_a_receipt_is_spent_once(fake_cluster):
+    async def scenario():
+        pool = ReceiptPool(pay_quote, "fake-cluster", size=1)
+        pool.register('compute', fake_cluster.client("issuer"), None)
+        await pool.refill()
+        return pool.take('compute')
+
+    receipt = asyncio.run(scenario())
+    fake_cluster.spend(receipt)
+    with pytest.raises(nillion.PaymentError):
+        fake_cluster.spend(receipt)
+
+
+def test_pool_hits_and_inline_payments_are_timed_as_separate_stages(fake_cluster):
+    def count(stage):
+        return metrics.histogram(stage).count
+
+    async def scenario():
+        pool = ReceiptPool(pay_quote, "fake-cluster", size=1)
+        client = fake_cluster.client("issuer")
+        pool.register('compute', client, None)
+        await pool.refill()
+        before = count('receipt_pool_take'), count('get_quote_and_pay')
+        await pool.payer('compute', get_quote_and_pay)(client, None, None, None, "fake-cluster")
+        after_hit = count('receipt_pool_take'), count('get_quote_and_pay')
+        await pool.payer('compute', get_quote_and_pay)(client, None, None, None, "fake-cluster")
+        after_miss = count('receipt_pool_take'), count('get_quote_and_pay')
+        return before, after_hit, after_miss
+
+    (takes, payments), after_hit, after_miss = asyncio.run(scenario())
+    assert after_hit == (takes + 1, payments)
+    assert after_miss == (takes + 2, payments + 1)
+
+
+def test_rejected_receipts_are_counted():
+    pool = ReceiptPool(pay_quote, "fake-cluster")
+    pool.reject('compute')
+    assert pool.stats()['rejected'] == 1
@@ -0,0 +1,159 @@
+import asyncio
+
+from client_registry import registry
+from redemption_writer import RedemptionWriter
+from ticket_index import REDEEM_FAILED
+from ticket_service import TicketService
+
+
+class FlakyWrite:
+    """write(key, ticket) that fails its first `failures` calls for each key in `keys` (default: every key)"""
+
+    def __init__(self, failures=0, keys=None):
+        self.failures = failures
+        self.keys = keys
+        self.calls = []
+
+    async def __call__(self, key, ticket):
+        self.calls.append(key)
+        if (self.keys is None or key in self.keys) and self.calls.count(key) <= self.failures:
+            raise ConnectionError(f"update of {key} failed")
+
+
+def test_marks_within_a_window_are_written_in_one_flush():
+    async def scenario():
+        write = FlakyWrite()
+        writer = RedemptionWriter(write, window=0.01)
+        marked = [writer.mark(key, {}) for key in ("s1", "s2", "s3", "s1")]
+        await asyncio.sleep(0.05)
+        return writer, write, marked
+
+    writer, write, marked = asyncio.run(scenario())
+    assert marked == [True, True, True, False]
+    assert sorted(write.calls) == ["s1", "s2", "s3"]
+    assert writer.stats() == {'pending': 0, 'flushes': 1, 'written': 3, 'retries': 0, 'failed': 0}
+
+
+def test_failed_writes_are_retried_with_backoff_and_stay_pending():
+    async def scenario():
+        write = FlakyWrite(failures=2)
+        writer = RedemptionWriter(write, window=0.001, backoff=0.01)
+        writer.mark("s1", {})
+        await asyncio.sleep(0.005)
+        pending_while_retrying = writer.pending("s1")
+        await asyncio.sleep(0.1)
+        return writer, write, pending_while_retrying
+
+    writer, write, pending_while_retrying = asyncio.run(scenario())
+    assert pending_while_retrying
+    assert write.calls == ["s1"] * 3
+    assert not writer.pending("s1")
+    assert writer.stats()['retries'] == 2
+    assert writer.stats()['written'] == 1
+
+
+def test_a_write_that_uses_up_its_attempts_is_given_up_and_still_turned_down():
+    async def scenario():
+        given_up = []
+
+        async def give_up(key, ticket):
+            given_up.append((key, ticket))
+
+        write = FlakyWrite(failures=10)
+        writer = RedemptionWriter(write, window=0.001, max_attempts=3, backoff=0.001, give_up=give_up)
+        writer.mark("s1", {'ticket_id': "7"})
+        await asyncio.sleep(0.1)
+        return writer, write, given_up
+
+    writer, write, given_up = asyncio.run(scenario())
+    assert write.calls == ["s1"] * 3
+    assert given_up == [("s1", {'ticket_id': "7"})]
+    assert writer.pending("s1")
+    assert writer.mark("s1", {}) is False
+    assert writer.stats()['failed'] == 1
+    assert writer.stats()['pending'] == 0
+
+
+def test_close_writes_what_is_waiting_for_the_window_or_a_backoff():
+    async def scenario():
+        write = FlakyWrite(failures=1, keys={"s1"})
+        writer = RedemptionWriter(write, window=0.001, backoff=60)
+        writer.mark("s1", {})
+        # Until the first attempt has failed and s1 waits out its backoff
+        while writer.stats()['retries'] == 0:
+            await asyncio.sleep(0.001)
+        writer.window = 60
+        writer.mark("s2", {})
+        await writer.close()
+        return writer, write
+
+    writer, write = asyncio.run(scenario())
+    assert sorted(write.calls) == ["s1", "s1", "s2"]
+    assert writer.stats()['pending'] == 0
+
+
+def test_an_unfinished_redemption_is_written_back_after_a_restart(fake_cluster, monkeypatch):
+    monkeypatch.setenv("TICKET_REDEEM_MAX_ATTEMPTS", "1")
+    monkeypatch.setenv("TICKET_REDEEM_FLUSH_MS", "1")
+
+    async def accept_while_updates_fail():
+        service = TicketService()
+        await service.start()
+        try:
+            await service.issue_ticket(9, 90, 0)
+            fake_cluster.failure_rate = {'update_values': 1.0}
+            scan = await service.scan_ticket(9, 90)
+            while (await service.get_ticket(9))['redemption'] != REDEEM_FAILED:
+                await asyncio.sleep(0.01)
+            return scan['store_id'], scan['result'], (await service.get_ticket(9))['redemption']
+        finally:
+            await service.close()
+
+    async def restart():
+        fake_cluster.failure_rate = 0.0
+        # A new process starts without the old event loop's clients
+        registry.clear()
+        service = TicketService()
+        await service.start()
+        try:
+            while service.redemptions.stats()['written'] == 0:
+                await asyncio.sleep(0.01)
+            return await service.get_ticket(9), (await service.scan_ticket(9, 90))['result']
+        finally:
+            await service.close()
+
+    store_id, accepted, redemption = asyncio.run(asyncio.wait_for(accept_while_updates_fail(), 5))
+    assert accepted['status'] == 1
+    assert redemption == REDEEM_FAILED
+    assert fake_cluster.stores[store_id]['is_redeemed'] == 0
+
+    ticket, rescan = asyncio.run(asyncio.wait_for(restart(), 5))
+    assert ticket['redemption'] is None
+    assert ticket['is_redeemed'] == 1
+    assert fake_cluster.stores[store_id]['is_redeemed'] == 1
+    assert rescan['status'] != 1
+
+
+def test_a_compute_that_outlives_an_earlier_write_back_does_not_admit_the_ticket_again(fake_cluster, monkeypatch):
+    monkeypatch.setenv("TICKET_REDEEM_FLUSH_MS", "1")
+    # Long enough for the first acceptance to be written back while the second compute still runs
+    fake_cluster.latency = {'compute': 0.2}
+
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            issued = await service.issue_ticket(9, 90, 0)
+            await service.redeem_ticket(None, None, 9, 90)
+            first = asyncio.create_task(service.scan_ticket(9, 90))
+            await asyncio.sleep(0.1)
+            second = asyncio.create_task(service.verify_ticket_id(9))
+            return issued['store_id'], (await first)['result'], (await second)['result']
+        finally:
+            await service.close()
+
+    store_id, first, second = asyncio.run(scenario())
+    assert first == {'status': 1}
+    assert second == {'status': 2}
+    assert fake_cluster.calls['update_values'] == 1
+    assert fake_cluster.stores[store_id]['is_redeemed'] == 1
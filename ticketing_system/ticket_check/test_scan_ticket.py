@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from ticket_service import TicketService
+
+
+@pytest.fixture(autouse=True)
+def quick_write_back(monkeypatch):
+    monkeypatch.setenv("TICKET_REDEEM_FLUSH_MS", "1")
+
+
+def run(scenario):
+    async def with_service():
+        service = TicketService()
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+
+    return asyncio.run(with_service())
+
+
+def test_a_valid_scan_is_one_compute_without_a_user_store(fake_cluster):
+    async def scenario(service):
+        issued = await service.issue_ticket(4, 40)
+        return issued, await service.scan_ticket(4, 40)
+
+    issued, scanned = run(scenario)
+
+    assert scanned == {'store_id': issued['store_id'], 'result': {'status': 1}}
+    assert fake_cluster.calls['compute'] == 1
+    # The issuer's store is the only one; the holder's inputs went in with the compute
+    assert fake_cluster.calls['store_values'] == 1
+    assert fake_cluster.stores[issued['store_id']]['is_redeemed'] == 1
+
+
+def test_a_scan_by_the_wrong_wallet_is_turned_down_and_not_written_back(fake_cluster):
+    async def scenario(service):
+        issued = await service.issue_ticket(4, 40)
+        return issued, await service.scan_ticket(4, 41), await service.get_ticket(4)
+
+    issued, scanned, ticket = run(scenario)
+
+    assert scanned['result']['status'] != 1
+    assert fake_cluster.calls['update_values'] == 0
+    assert fake_cluster.stores[issued['store_id']]['is_redeemed'] == 0
+    assert ticket['wallet_id'] == '41'
+
+
+def test_a_ticket_is_admitted_by_one_scan_only(fake_cluster):
+    async def scenario(service):
+        await service.issue_ticket(4, 40)
+        first = await service.scan_ticket(4, 40)
+        await asyncio.sleep(0.05)
+        return first, await service.scan_ticket(4, 40)
+
+    first, second = run(scenario)
+
+    assert first['result'] == {'status': 1}
+    assert second['result'] == {'status': 2}
+    assert fake_cluster.calls['update_values'] == 1
+
+
+def test_a_double_fired_scan_shares_one_compute(fake_cluster):
+    fake_cluster.latency = {'compute': 0.05}
+
+    async def scenario(service):
+        await service.issue_ticket(4, 40)
+        return await asyncio.gather(service.scan_ticket(4, 40), service.scan_ticket(4, 40))
+
+    scans = run(scenario)
+
+    assert sorted(scan['result']['status'] for scan in scans) == [1, 2]
+    assert fake_cluster.calls['compute'] == 1
+
+
+def test_scanning_an_unknown_ticket_fails_before_any_payment(fake_cluster):
+    async def scenario(service):
+        with pytest.raises(LookupError):
+            await service.scan_ticket(5, 50)
+
+    run(scenario)
+
+    assert fake_cluster.calls['compute'] == 0
+    assert fake_cluster.calls['pay'] == 0
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+from ticket_service import TicketService
+
+
+def test_concurrent_calls_with_one_key_share_one_run():
+    async def scenario():
+        flight = SingleFlight()
+        runs = []
+
+        async def operation():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return {'status': 1}
+
+        results = await asyncio.gather(*(flight.run('key', operation) for _ in range(4)))
+        return runs, results, flight.stats()
+
+    runs, results, stats = asyncio.run(scenario())
+    assert runs == [1]
+    assert results == [{'status': 1}] * 4
+    assert stats == {'in_flight': 0, 'calls': 1, 'coalesced': 3}
+
+
+def test_followers_get_the_follow_transform():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def operation():
+            await asyncio.sleep(0.01)
+            return 1
+
+        return await asyncio.gather(*(flight.run('key', operation, follow=lambda result: -result) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [1, -1, -1]
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def operation():
+            await asyncio.sleep(0.02)
+            return 'done'
+
+        impatient = asyncio.create_task(flight.run('key', operation))
+        patient = asyncio.create_task(flight.run('key', operation))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario()) == 'done'
+
+
+def test_errors_reach_every_caller_and_the_key_is_released():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.run('key', failing) for _ in range(2)), return_exceptions=True)
+        again = await flight.run('key', lambda: asyncio.sleep(0, 'ok'))
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert again == 'ok'
+
+
+@pytest.mark.usefixtures("fake_cluster")
+def test_duplicate_scans_admit_a_ticket_once():
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            await service.issue_ticket(8, 80, 0)
+            scans = await asyncio.gather(*(service.scan_ticket(8, 80) for _ in range(5)))
+            return [scan['result']['status'] for scan in scans]
+        finally:
+            await service.close()
+
+    assert sorted(asyncio.run(scenario())) == [1, 2, 2, 2, 2]
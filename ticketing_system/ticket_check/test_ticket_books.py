@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from ticket_service import TicketService
+
+pytestmark = pytest.mark.usefixtures("batch_programs")
+
+
+def run(scenario):
+    async def with_service():
+        service = TicketService()
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+    return asyncio.run(with_service())
+
+
+def test_a_book_is_stored_once_and_indexed_with_its_width(batch_programs):
+    async def scenario(service):
+        book = await service.issue_ticket_book([(1, 10, 0), (2, 20, 0), (3, 30, 1)], width=8)
+        return book, await service.get_ticket(2)
+
+    book, ticket = run(scenario)
+    assert book['slots'] == {'1': 0, '2': 1, '3': 2}
+    assert (ticket['store_id'], ticket['book_slot'], ticket['book_width']) == (book['store_id'], 1, 8)
+    assert batch_programs.calls['store_values'] == 1
+    stored = batch_programs.stores[book['store_id']]
+    # Unused slots are stored as redeemed
+    assert stored['is_redeemed'] == [0, 0, 1, 1, 1, 1, 1, 1]
+    assert stored['ticket_ids'][:3] == [1, 2, 3]
+
+
+def test_claims_on_one_book_share_one_compute(batch_programs):
+    async def scenario(service):
+        await service.issue_ticket_book([(1, 10, 0), (2, 20, 0), (3, 30, 1)], width=8)
+        return await service.verify_book_claims([(2, 20), (1, 99), (3, 30)])
+
+    # The right holder, a wrong wallet, and a ticket issued as redeemed
+    statuses = run(scenario)
+    assert statuses[0] == 1
+    assert statuses[1] != 1
+    assert statuses[2] == 2
+    assert batch_programs.calls['compute'] == 1
+
+
+def test_an_accepted_slot_is_written_back_and_turned_down_after(batch_programs, monkeypatch):
+    monkeypatch.setenv("TICKET_REDEEM_FLUSH_MS", "1")
+
+    async def scenario(service):
+        book = await service.issue_ticket_book([(1, 10, 0), (2, 20, 0)], width=8)
+        first = await service.verify_book_claims([(1, 10)])
+        await asyncio.sleep(0.05)
+        again = await service.verify_book_claims([(1, 10), (2, 20)])
+        return book['store_id'], first, again, await service.get_ticket(1)
+
+    store_id, first, again, ticket = run(scenario)
+    assert first == [1]
+    assert again == [2, 1]
+    assert batch_programs.stores[store_id]['is_redeemed'][:2] == [1, 1]
+    assert ticket['is_redeemed'] == 1
+
+
+def test_books_touched_by_one_request_are_checked_separately(batch_programs):
+    async def scenario(service):
+        await service.issue_ticket_book([(1, 10, 0)], width=8)
+        await service.issue_ticket_book([(2, 20, 0)], width=32)
+        return await service.verify_book_claims([(2, 20), (1, 10)])
+
+    assert run(scenario) == [1, 1]
+    assert batch_programs.calls['compute'] == 2
+
+
+def test_bad_claims_are_refused():
+    async def scenario(service):
+        await service.issue_ticket(4, 40)
+        await service.issue_ticket_book([(1, 10, 0)], width=8)
+        errors = []
+        for claims in ([(1, 10), (1, 10)], [(4, 40)], [(5, 50)]):
+            try:
+                await service.verify_book_claims(claims)
+            except (KeyError, ValueError) as e:
+                errors.append(type(e))
+        try:
+            await service.issue_ticket_book([(6, 60, 0)], width=9)
+        except ValueError as e:
+            errors.append(type(e))
+        return errors
+
+    assert run(scenario) == [ValueError, KeyError, KeyError, ValueError]
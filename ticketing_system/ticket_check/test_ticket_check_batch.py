@@ -0,0 +1,53 @@
+import json
+import os
+
+import pytest
+from nada_dsl.compile import compile_script
+
+from fake_nillion import evaluate_ticket_check, plain_value
+from nillion_config import NillionConfig
+from ticket_computation import BATCH_WIDTHS, TicketComputation
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "nada_programs", "src")
+
+
+@pytest.mark.parametrize("width", BATCH_WIDTHS)
+def test_batch_programs_take_and_return_arrays_of_their_width(width):
+    mir = json.loads(compile_script(os.path.join(PROGRAMS, f"ticket_check_batch_{width}.py")).mir)
+    array = {'Array': {'inner_type': 'SecretInteger', 'size': width}}
+
+    inputs = {value['name']: (value['type'], value['party']) for value in mir['inputs']}
+    assert inputs == {
+        'user_tickets': (array, 'User'),
+        'user_wallets': (array, 'User'),
+        'user_redeems': (array, 'User'),
+        'ticket_ids': (array, 'Issuer'),
+        'ticket_owners': (array, 'Issuer'),
+        'is_redeemed': (array, 'Issuer'),
+    }
+    assert [(output['name'], output['type']) for output in mir['outputs']] == [('statuses', array)]
+
+
+def test_claims_are_padded_to_the_width(fake_cluster):
+    computation = TicketComputation(NillionConfig.from_env())
+    values = computation.claim_values([(1, 10), (2, 20)], 8).dict()
+
+    assert plain_value(values['user_tickets']) == [1, 2, 0, 0, 0, 0, 0, 0]
+    assert plain_value(values['user_wallets']) == [10, 20, 0, 0, 0, 0, 0, 0]
+    assert plain_value(values['user_redeems']) == [1] * 8
+
+
+def test_each_slot_is_checked_like_a_single_ticket():
+    book = {'ticket_ids': [1, 2, 3], 'ticket_owners': [10, 20, 30], 'is_redeemed': [0, 1, 0]}
+    claims = {'user_tickets': [1, 2, 3], 'user_wallets': [10, 20, 31], 'user_redeems': [1, 1, 1]}
+
+    statuses = evaluate_ticket_check({**book, **claims})['statuses']
+
+    for slot, status in enumerate(statuses):
+        single = evaluate_ticket_check({
+            'ticket_id': book['ticket_ids'][slot], 'ticket_owner': book['ticket_owners'][slot],
+            'is_redeemed': book['is_redeemed'][slot], 'user_ticket': claims['user_tickets'][slot],
+            'user_wallet': claims['user_wallets'][slot], 'user_redeem': 1,
+        })
+        assert status == single['status']
+    assert statuses == [1, 2, 2]
@@ -0,0 +1,112 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from ticket_index import CLAIMED, ISSUED, REDEEM_FAILED, REDEEMING, VERIFIED, TicketIndex
+from ticket_service import TicketService
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TicketIndex(str(tmp_path / "index" / "tickets.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_a_ticket_moves_from_issued_to_claimed_to_verified(index):
+    index.record_issued(1, 10, "user", "store-1", "program", "trace")
+    assert index.get(1)['status'] == ISSUED
+
+    index.record_claim(1, 77, "party-a store-a")
+    assert index.get(1)['status'] == CLAIMED
+    assert index.get(1)['wallet_id'] == "77"
+
+    index.record_result("store-1", "party-a store-a", 1)
+    ticket = index.get(1)
+    assert (ticket['status'], ticket['result']) == (VERIFIED, 1)
+    assert index.by_store("store-1")['ticket_id'] == "1"
+    assert [row['ticket_id'] for row in index.by_wallet(77)] == ["1"]
+    assert index.get(2) is None
+
+
+def test_a_scan_by_another_wallet_keeps_the_stored_claim(index):
+    index.record_issued(1, 10, "user", "store-1")
+    index.record_claim(1, 77, "party-a store-a")
+
+    index.record_scan(1, 99, 0)
+
+    assert index.get(1)['wallet_id'] == "77"
+    assert index.get(1)['result'] == 0
+
+
+def test_redemption_state_lasts_until_the_store_is_written(index):
+    index.record_issued(1, 10, "user", "store-1")
+    index.record_issued(2, 20, "user", "store-2")
+
+    index.record_redeeming(1)
+    index.record_redeeming(2, REDEEM_FAILED)
+    assert {row['ticket_id']: row['redemption'] for row in index.unwritten_redemptions()} == {
+        "1": REDEEMING, "2": REDEEM_FAILED
+    }
+
+    index.record_redeemed([1, 2])
+    assert index.unwritten_redemptions() == []
+    assert index.get(1)['is_redeemed'] == 1
+
+
+def test_a_book_is_indexed_slot_by_slot(index):
+    index.record_book("book-1", "user", "program", [(5, 50, 0), (6, 60, 1)], 8)
+
+    tickets = index.book_tickets("book-1")
+    assert [(row['ticket_id'], row['book_slot'], row['is_redeemed']) for row in tickets] == [
+        ("5", 0, 0), ("6", 1, 1)
+    ]
+
+
+def test_indexes_from_before_the_later_columns_are_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE tickets (ticket_id TEXT PRIMARY KEY, ticket_owner TEXT NOT NULL, user_id TEXT NOT NULL, "
+        "store_id TEXT NOT NULL, program_id TEXT, wallet_id TEXT, party_ids_to_store_ids TEXT, "
+        "status TEXT NOT NULL, result INTEGER, updated_at REAL NOT NULL)"
+    )
+    connection.close()
+
+    index = TicketIndex(path)
+    try:
+        index.record_issued(1, 10, "user", "store-1", trace_id="trace", book_slot=3)
+        assert index.get(1)['trace_id'] == "trace"
+        assert index.get(1)['book_slot'] == 3
+    finally:
+        index.close()
+
+
+def test_reads_see_the_writes_submitted_before_them(index):
+    async def scenario():
+        writes = [index.write(index.record_issued, i, i, "user", f"store-{i}") for i in range(20)]
+        read = index.read(index.get, 19)
+        results = await asyncio.gather(*writes, read)
+        return results[-1]
+
+    assert asyncio.run(scenario())['store_id'] == "store-19"
+
+
+def test_service_lookups_come_from_the_index(fake_cluster):
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            issued = await service.issue_ticket(3, 30)
+            ticket = await service.lookup_ticket(3)
+            owned = await service.wallet_tickets(30)
+            with pytest.raises(LookupError):
+                await service.lookup_ticket(4)
+            return issued, ticket, owned
+        finally:
+            await service.close()
+
+    issued, ticket, owned = asyncio.run(scenario())
+    assert ticket['store_id'] == issued['store_id']
+    assert [row['ticket_id'] for row in owned] == ["3"]
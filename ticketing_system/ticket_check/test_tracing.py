@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+
+import tracing
+from ticket_service import TicketService
+
+
+def read_spans(path):
+    with open(path) as trace_file:
+        return [json.loads(line) for line in trace_file]
+
+
+def test_spans_nest_and_are_written_by_the_exporter_thread(tmp_path, monkeypatch):
+    path = tmp_path / "traces" / "spans.jsonl"
+    exporter = tracing.JsonlExporter(str(path))
+    monkeypatch.setattr(tracing, 'exporter', exporter)
+    writes = []
+    real_write = exporter._write
+    monkeypatch.setattr(exporter, '_write', lambda: writes.append(threading.current_thread().name) or real_write())
+
+    with tracing.start_span('outer', ticket_id="1") as outer:
+        with tracing.start_span('inner') as inner:
+            inner.set('store_id', "store-1")
+    exporter.close()
+
+    spans = {span['name']: span for span in read_spans(path)}
+    assert spans['inner']['parent_id'] == outer.span_id
+    assert spans['inner']['trace_id'] == spans['outer']['trace_id']
+    assert spans['inner']['attributes'] == {'store_id': "store-1"}
+    assert writes == ["trace-exporter"]
+
+
+def test_failed_spans_record_the_error(tmp_path, monkeypatch):
+    exporter = tracing.JsonlExporter(str(tmp_path / "spans.jsonl"))
+    monkeypatch.setattr(tracing, 'exporter', exporter)
+
+    try:
+        with tracing.start_span('failing'):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    exporter.close()
+
+    span, = read_spans(tmp_path / "spans.jsonl")
+    assert (span['status'], span['error']) == ('error', "ValueError: boom")
+
+
+def test_tracing_is_a_no_op_without_an_exporter(monkeypatch):
+    monkeypatch.setattr(tracing, 'exporter', None)
+    assert tracing.start_span('anything') is tracing.NOOP_SPAN
+    assert not tracing.enabled()
+
+
+def test_a_ticket_keeps_one_trace_from_issue_to_verify(fake_cluster, tmp_path, monkeypatch):
+    exporter = tracing.JsonlExporter(str(tmp_path / "spans.jsonl"))
+    monkeypatch.setattr(tracing, 'exporter', exporter)
+
+    async def scenario():
+        service = TicketService()
+        await service.start()
+        try:
+            issued = await service.issue_ticket(5, 50)
+            redeemed = await service.redeem_ticket(None, None, 5, 50)
+            await service.verify_ticket(issued['store_id'], redeemed['party_ids_to_store_ids'])
+            return await service.get_ticket(5)
+        finally:
+            await service.close()
+
+    ticket = asyncio.run(scenario())
+    exporter.close()
+
+    spans = read_spans(tmp_path / "spans.jsonl")
+    by_name = {span['name']: span for span in spans}
+    for name in ('issue_ticket', 'redeem_ticket', 'verify_ticket', 'store_program', 'compute'):
+        assert by_name[name]['trace_id'] == ticket['trace_id'], name
+    # The stored program's id, not the id of the upload action
+    assert by_name['store_program']['attributes']['program_id'] == ticket['program_id']
+    assert by_name['compute']['attributes']['compute_id']
@@ -0,0 +1,43 @@
+import time
+
+from verify_cache import VerifyCache
+
+
+def test_verify_cache_hit_and_lru_eviction():
+    cache = VerifyCache(maxsize=2, ttl=60)
+    cache.put("s1", {"p": "u1"}, {'status': 1})
+    cache.put("s2", {"p": "u2"}, {'status': 0})
+    assert cache.get("s1", {"p": "u1"}) == {'status': 1}
+
+    cache.put("s3", {"p": "u3"}, {'status': 2})
+
+    assert cache.get("s2", {"p": "u2"}) is None
+    assert cache.get("s1", {"p": "u1"}) == {'status': 1}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_verify_cache_key_ignores_mapping_order():
+    cache = VerifyCache()
+    cache.put("s1", {"a": "1", "b": "2"}, {'status': 1})
+    assert cache.get("s1", {"b": "2", "a": "1"}) == {'status': 1}
+
+
+def test_verify_cache_expires_after_ttl():
+    cache = VerifyCache(ttl=0.01)
+    cache.put("s1", {"p": "u1"}, {'status': 1})
+    time.sleep(0.02)
+    assert cache.get("s1", {"p": "u1"}) is None
+    assert cache.stats()['expired'] == 1
+
+
+def test_verify_cache_invalidate_drops_every_entry_for_a_store():
+    cache = VerifyCache()
+    cache.put("s1", {"p": "u1"}, {'status': 1})
+    cache.put("s1", {"p": "u2"}, {'status': 0})
+    cache.put("s2", {"p": "u1"}, {'status': 1})
+
+    cache.invalidate("s1")
+
+    assert cache.get("s1", {"p": "u1"}) is None
+    assert cache.get("s1", {"p": "u2"}) is None
+    assert cache.get("s2", {"p": "u1"}) == {'status': 1}
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from cosmpy.aerial.exceptions import BroadcastError
+from cosmpy.aerial.wallet import LocalWallet
+from cosmpy.crypto.keypairs import PrivateKey
+
+from wallet_pool import WalletPool
+
+
+def new_pool(cluster, wallets=1):
+    return WalletPool(cluster.ledger, [LocalWallet(PrivateKey(), prefix="nillion") for _ in range(wallets)])
+
+
+def test_sequence_numbers_are_tracked_locally(fake_cluster):
+    pool = new_pool(fake_cluster)
+    for _ in range(3):
+        pool.pay_quotes([fake_cluster.quote()])
+
+    address = str(pool.wallets[0].wallet.address())
+    assert fake_cluster.ledger.sequences[address] == 3
+    assert pool.stats()['transactions'] == 3
+    assert pool.stats()['resyncs'] == 0
+
+
+def test_sequence_mismatch_resyncs_and_retries(fake_cluster):
+    pool = new_pool(fake_cluster)
+    pool.pay_quotes([fake_cluster.quote()])
+    # Another signer used the same account
+    address = str(pool.wallets[0].wallet.address())
+    fake_cluster.ledger.sequences[address] += 1
+
+    pool.pay_quotes([fake_cluster.quote()])
+
+    assert pool.stats()['resyncs'] == 1
+    assert pool.stats()['transactions'] == 2
+    assert fake_cluster.ledger.sequences[address] == 3
+
+
+def test_other_broadcast_errors_are_raised(fake_cluster):
+    pool = new_pool(fake_cluster)
+    fake_cluster.failure_rate = {'broadcast': 1.0}
+
+    with pytest.raises(BroadcastError):
+        pool.pay_quotes([fake_cluster.quote()])
+
+    assert pool.stats()['resyncs'] == 0
+    assert pool.stats()['in_flight'] == [0]
+
+
+def test_payments_spread_over_idle_wallets(fake_cluster):
+    pool = new_pool(fake_cluster, wallets=2)
+    entry = pool._acquire()
+    try:
+        pool.pay_quotes([fake_cluster.quote()])
+    finally:
+        pool._release(entry)
+
+    other = next(wallet for wallet in pool.wallets if wallet is not entry)
+    assert fake_cluster.ledger.sequences[str(other.wallet.address())] == 1
+    assert str(entry.wallet.address()) not in fake_cluster.ledger.sequences
+
+
+def test_concurrent_payments_are_all_counted(fake_cluster):
+    pool = new_pool(fake_cluster, wallets=4)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: pool.pay_quotes([fake_cluster.quote()]), range(200)))
+
+    assert pool.stats()['transactions'] == 200
+    assert sum(fake_cluster.ledger.sequences.values()) == 200
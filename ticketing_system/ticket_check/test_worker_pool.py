@@ -0,0 +1,68 @@
+import asyncio
+import importlib
+
+import pytest
+
+import worker_pool
+
+
+@pytest.fixture
+def in_process_worker(fake_cluster, monkeypatch):
+    """This process set up the way _init_worker sets up a pool process, on the fake cluster"""
+    loop = asyncio.new_event_loop()
+    monkeypatch.setattr(worker_pool, '_loop', loop)
+    monkeypatch.setattr(worker_pool, '_modules', {
+        stage: importlib.import_module(module_name) for stage, module_name in worker_pool.STAGES.items()
+    })
+    yield fake_cluster
+    loop.close()
+
+
+def test_params_become_the_scripts_command_line():
+    assert worker_pool._to_argv({'store_id_1': 'abc', 'party_ids_to_store_ids': ['p1:s1', 'p2:s2']}) == [
+        '--store_id_1', 'abc', '--party_ids_to_store_ids', 'p1:s1', 'p2:s2'
+    ]
+
+
+def test_jobs_run_the_pipeline_and_name_its_results(in_process_worker):
+    issued = worker_pool.run_job({'id': 1, 'stage': 'issue',
+                                  'params': {'ticket_id': 7, 'ticket_owner': 70, 'is_redeemed': 0}})
+    redeemed = worker_pool.run_job({'id': 2, 'stage': 'redeem', 'params': {
+        'ticket_id': 7, 'user_id_1': issued['user_id'], 'wallet_id': 70, 'store_id_1': issued['store_id'],
+    }})
+    verified = worker_pool.run_job({'id': 3, 'stage': 'verify', 'params': {
+        'store_id_1': redeemed['store_id'], 'party_ids_to_store_ids': redeemed['party_ids_to_store_ids'].split(),
+    }})
+
+    assert issued['status'] == redeemed['status'] == 'success'
+    assert (issued['id'], redeemed['id'], verified['id']) == (1, 2, 3)
+    assert verified['status'] == 'success'
+    assert verified['result'] == {'status': 1}
+
+
+def test_bad_params_are_reported_instead_of_killing_the_worker(in_process_worker):
+    response = worker_pool.run_job({'id': 4, 'stage': 'issue', 'params': {'ticket_id': 'seven'}})
+
+    assert response == {'id': 4, 'stage': 'issue', 'status': 'error', 'message': "Invalid params for issue"}
+
+
+def test_each_worker_claims_its_own_key(tmp_path, monkeypatch):
+    monkeypatch.setenv("NILLION_KEY_LOCK_DIR", str(tmp_path))
+    held = []
+    monkeypatch.setattr(worker_pool, '_key_lock', None)
+
+    for _ in range(2):
+        held.append(worker_pool._claim_key(2))
+        # Keep the lock open the way a live worker does
+        held.append(worker_pool._key_lock)
+
+    assert [held[0], held[2]] == [0, 1]
+    with pytest.raises(RuntimeError):
+        worker_pool._claim_key(2, timeout=0.1)
+
+
+def test_a_pool_larger_than_the_funded_keys_is_refused(monkeypatch):
+    monkeypatch.setattr(worker_pool, 'private_key_count', lambda: 2)
+
+    with pytest.raises(ValueError):
+        worker_pool.TicketWorkerPool(pool_size=3)
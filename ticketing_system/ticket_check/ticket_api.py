@@ -0,0 +1,183 @@
+# Request parsing and response shaping for the /api routes, shared by flask_app and async_app.
+# Handlers take the TicketService, the JSON body and any URL parameters and return (body, status);
+# each app only adds the glue that runs them on its event loop.
+
+
+class Route:
+    def __init__(self, rule, methods, handler):
+        self.rule = rule
+        self.methods = methods
+        self.handler = handler
+
+    @property
+    def endpoint(self):
+        return self.handler.__name__
+
+
+ROUTES = []
+
+
+def route(rule, methods=('POST',)):
+    def register(handler):
+        ROUTES.append(Route(rule, list(methods), handler))
+        return handler
+    return register
+
+
+async def respond(route, service, data, **params):
+    """(body, status) for one request; any failure becomes the API's error body"""
+    try:
+        if 'POST' in route.methods and data is None:
+            raise ValueError("Expected a JSON request body")
+        return await route.handler(service, data, **params)
+    except Exception as e:
+        return error(str(e))
+
+
+def script_cmd(script, **flags):
+    """The numbered-script command line equivalent to a request, kept in responses as `cmd`"""
+    return ' '.join(['python3', script] + [f"--{flag} {value}" for flag, value in flags.items()])
+
+
+def error(message, status=500):
+    return {
+        'status': 'error',
+        'message': message
+    }, status
+
+
+@route('/api/initial')
+async def initial_setup(service, data):
+    ticket_id = data.get('ticket_id', 1)
+    ticket_owner = data.get('ticket_owner', 5)
+    is_redeemed = data.get('is_redeemed', 0)
+
+    issued = await service.issue_ticket(ticket_id, ticket_owner, is_redeemed)
+
+    return {
+        'cmd': script_cmd('01_server_initial_data_set.py', ticket_id=ticket_id, ticket_owner=ticket_owner,
+                          is_redeemed=is_redeemed),
+        'status': 'success',
+        'user_id': issued['user_id'],
+        'store_id': issued['store_id']
+    }, 200
+
+
+@route('/api/redeem')
+async def redeem_ticket(service, data):
+    user_id = data.get('user_id')
+    store_id = data.get('store_id')
+    ticket_id = data.get('ticket_id')
+    wallet_id = data.get('wallet_id')
+
+    redeemed = await service.redeem_ticket(user_id, store_id, ticket_id, wallet_id)
+
+    return {
+        'cmd': script_cmd('02_redeem_ticket.py', ticket_id=ticket_id, user_id_1=user_id, wallet_id=wallet_id,
+                          store_id_1=store_id),
+        'status': 'success',
+        'store_id': redeemed['store_id'],
+        'party_ids_to_store_ids': redeemed['party_ids_to_store_ids']
+    }, 200
+
+
+@route('/api/verify')
+async def verify_ticket(service, data):
+    store_id = data.get('store_id')
+    party_ids_to_store_ids = data.get('party_ids_to_store_ids')
+
+    if store_id is None and data.get('ticket_id') is not None:
+        # Gate scan: the ticket index supplies the issuer store and the latest claim
+        verified = await service.verify_ticket_id(data['ticket_id'])
+        store_id = verified['store_id']
+        party_ids_to_store_ids = verified['party_ids_to_store_ids']
+        result = verified['result']
+    else:
+        result = await service.verify_ticket(store_id, party_ids_to_store_ids)
+
+    return {
+        'cmd': script_cmd('03_multi_party_compute.py', store_id_1=store_id,
+                          party_ids_to_store_ids=party_ids_to_store_ids),
+        'status': 'success',
+        'result': result,
+        'store_id': store_id,
+        'party_ids_to_store_ids': party_ids_to_store_ids
+    }, 200
+
+
+@route('/api/scan')
+async def scan_ticket(service, data):
+    ticket_id = data.get('ticket_id')
+    wallet_id = data.get('wallet_id')
+    store_id = data.get('store_id')
+
+    # One compute with the holder's inputs as compute-time secrets; no /api/redeem beforehand
+    scanned = await service.scan_ticket(ticket_id, wallet_id, store_id)
+
+    return {
+        'status': 'success',
+        'result': scanned['result'],
+        'store_id': scanned['store_id']
+    }, 200
+
+
+@route('/api/prestage')
+async def prestage_ticket(service, data):
+    ticket_id = data.get('ticket_id')
+    wallet_id = data.get('wallet_id')
+
+    # Called by the holder's app ahead of the event, so the gate only has to compute
+    staged = await service.prestage_ticket(ticket_id, wallet_id)
+
+    return {
+        'status': 'success',
+        'store_id': staged['store_id'],
+        'party_ids_to_store_ids': staged['party_ids_to_store_ids']
+    }, 200
+
+
+@route('/api/gate')
+async def gate_scan(service, data):
+    ticket_id = data.get('ticket_id')
+    wallet_id = data.get('wallet_id')
+
+    scanned = await service.gate_scan(ticket_id, wallet_id)
+
+    return {
+        'status': 'success',
+        'result': scanned['result'],
+        'store_id': scanned['store_id'],
+        'prestaged': scanned['prestaged']
+    }, 200
+
+
+@route('/api/verify_book')
+async def verify_book_claims(service, data):
+    claims = [(claim.get('ticket_id'), claim.get('wallet_id')) for claim in data.get('claims', [])]
+
+    # One compute per ticket book touched, with the issuer side read from the stored book
+    statuses = await service.verify_book_claims(claims)
+
+    return {
+        'status': 'success',
+        'statuses': statuses
+    }, 200
+
+
+@route('/api/tickets/<ticket_id>', methods=('GET',))
+async def get_ticket(service, data, ticket_id):
+    ticket = await service.get_ticket(ticket_id)
+    if ticket is None:
+        return error(f"Unknown ticket {ticket_id}", 404)
+    return {
+        'status': 'success',
+        'ticket': ticket
+    }, 200
+
+
+@route('/api/wallets/<wallet_id>/tickets', methods=('GET',))
+async def get_wallet_tickets(service, data, wallet_id):
+    return {
+        'status': 'success',
+        'tickets': await service.wallet_tickets(wallet_id)
+    }, 200
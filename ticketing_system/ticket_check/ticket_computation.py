@@ -1,56 +1,27 @@
-import asyncio
-import os
 import argparse
-from dataclasses import dataclass
 from typing import Dict, List
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
+from metrics import timed
+from compute_dispatcher import dispatcher_for
+
+# Widths of the compiled ticket_check_batch_<width> programs
+BATCH_WIDTHS = (8, 32, 128)
 
 
 class TicketComputation:
     def __init__(self, config: NillionConfig):
         self.config = config
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
         self.user_id = self.client.user_id
         self.party_id = self.client.party_id
         self.program_id = f"{self.user_id}/{config.program_name}"
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
+        with timed('setup_payments'):
+            return create_payments(self.config)
 
     def parse_party_store_ids(self, party_store_pairs: List[str]) -> Dict[str, str]:
         party_store_mapping = {}
@@ -73,14 +44,15 @@ class TicketComputation:
         return compute_bindings
 
     async def perform_computation(self, store_id_1: str, party_store_mapping: Dict[str, str],
-                                  payments_client, payments_wallet):
+                                  payments_client, payments_wallet, pay=None, timeout=None):
+        pay = pay or get_quote_and_pay
         print(f"Computing using program {self.program_id}")
         print(f"Party 1 secret store_id: {store_id_1}")
 
         compute_bindings = self.setup_compute_bindings(party_store_mapping.keys())
         compute_time_secrets = nillion.NadaValues({})
 
-        receipt = await get_quote_and_pay(
+        receipt = await pay(
             self.client,
             nillion.Operation.compute(self.program_id, compute_time_secrets),
             payments_wallet,
@@ -89,25 +61,116 @@ class TicketComputation:
         )
 
         store_ids = [store_id_1] + list(party_store_mapping.values())
-        compute_id = await self.client.compute(
+        with timed('compute') as stage:
+            compute_id = await self.client.compute(
+                self.config.cluster_id,
+                compute_bindings,
+                store_ids,
+                compute_time_secrets,
+                receipt,
+            )
+            stage.set('compute_id', compute_id)
+            stage.set('store_ids', store_ids)
+        print(compute_id)
+
+        print(f"The computation was sent to the network. compute_id: {compute_id}")
+        return await self.wait_for_result(compute_id, timeout)
+
+    def claim_secrets(self, user_ticket, user_wallet) -> nillion.NadaValues:
+        return nillion.NadaValues({
+            'user_ticket': nillion.SecretInteger(int(user_ticket)),
+            'user_wallet': nillion.SecretInteger(int(user_wallet)),
+            'user_redeem': nillion.SecretInteger(1),
+        })
+
+    async def perform_direct_computation(self, store_id_1: str, user_ticket, user_wallet,
+                                         payments_client, payments_wallet, pay=None, timeout=None):
+        """Check a claim passed as compute-time secrets, with no user store_values, payment or permission grant"""
+        pay = pay or get_quote_and_pay
+        print(f"Computing using program {self.program_id}")
+        print(f"Party 1 secret store_id: {store_id_1}")
+
+        # The scanning party supplies the User inputs itself
+        compute_bindings = self.setup_compute_bindings([self.party_id])
+        compute_time_secrets = self.claim_secrets(user_ticket, user_wallet)
+
+        receipt = await pay(
+            self.client,
+            nillion.Operation.compute(self.program_id, compute_time_secrets),
+            payments_wallet,
+            payments_client,
             self.config.cluster_id,
-            compute_bindings,
-            store_ids,
-            compute_time_secrets,
-            receipt,
         )
-        print(compute_id)
+
+        with timed('compute') as stage:
+            compute_id = await self.client.compute(
+                self.config.cluster_id,
+                compute_bindings,
+                [store_id_1],
+                compute_time_secrets,
+                receipt,
+            )
+            stage.set('compute_id', compute_id)
+            stage.set('store_ids', [store_id_1])
+
+        print(f"The computation was sent to the network. compute_id: {compute_id}")
+        return await self.wait_for_result(compute_id, timeout)
+
+    def claim_values(self, claims: List[tuple], width: int) -> nillion.NadaValues:
+        # Unused slots are padded with zeros; their statuses are dropped
+        claims = list(claims) + [(0, 0)] * (width - len(claims))
+        return nillion.NadaValues({
+            'user_tickets': nillion.Array([nillion.SecretInteger(int(ticket)) for ticket, _ in claims]),
+            'user_wallets': nillion.Array([nillion.SecretInteger(int(wallet)) for _, wallet in claims]),
+            'user_redeems': nillion.Array([nillion.SecretInteger(1) for _ in claims]),
+        })
+
+    async def perform_book_computation(self, book_store_id: str, width: int, claims: Dict[int, tuple],
+                                       payments_client, payments_wallet, pay=None, timeout=None) -> Dict[int, int]:
+        """Check {slot: (user_ticket, user_wallet)} claims against a ticket book stored at `book_store_id`"""
+        pay = pay or get_quote_and_pay
+        program_id = f"{self.user_id}/{self.config.program_name}_batch_{width}"
+        print(f"Computing {len(claims)} claims against book {book_store_id} using program {program_id}")
+
+        # The issuer records come from the stored book; the gate supplies the User claims itself
+        compute_bindings = nillion.ProgramBindings(program_id)
+        compute_bindings.add_input_party("Issuer", self.party_id)
+        compute_bindings.add_input_party("User", self.party_id)
+        compute_bindings.add_output_party("Issuer", self.party_id)
+        compute_time_secrets = self.claim_values([claims.get(slot, (0, 0)) for slot in range(width)], width)
+
+        receipt = await pay(
+            self.client,
+            nillion.Operation.compute(program_id, compute_time_secrets),
+            payments_wallet,
+            payments_client,
+            self.config.cluster_id,
+        )
+
+        with timed('compute') as stage:
+            compute_id = await self.client.compute(
+                self.config.cluster_id,
+                compute_bindings,
+                [book_store_id],
+                compute_time_secrets,
+                receipt,
+            )
+            stage.set('compute_id', compute_id)
+            stage.set('store_ids', [book_store_id])
 
         print(f"The computation was sent to the network. compute_id: {compute_id}")
-        return await self.wait_for_result()
-
-    async def wait_for_result(self):
-        while True:
-            compute_event = await self.client.next_compute_event()
-            if isinstance(compute_event, nillion.ComputeFinishedEvent):
-                print(f"✅  Compute complete for compute_id {compute_event.uuid}")
-                print(f"🖥️  The result is {compute_event.result.value}")
-                return compute_event.result.value
+        statuses = (await self.wait_for_result(compute_id, timeout))['statuses']
+        return {slot: statuses[slot] for slot in claims}
+
+    async def wait_for_result(self, compute_id: str, timeout=None):
+        # The client's dispatcher routes each ComputeFinishedEvent to its own compute_id,
+        # so concurrent computations on one client never see each other's results
+        with timed('wait_for_result') as stage:
+            stage.set('compute_id', compute_id)
+            result = await dispatcher_for(self.client).wait(compute_id, timeout)
+        print(f"✅  Compute complete for compute_id {compute_id}")
+        print(f"🖥️  The result is {result}")
+        return result
 
 
 def parse_args(args=None):
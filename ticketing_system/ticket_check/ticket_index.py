@@ -0,0 +1,188 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from nillion_config import data_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    ticket_id TEXT PRIMARY KEY,
+    ticket_owner TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    program_id TEXT,
+    wallet_id TEXT,
+    party_ids_to_store_ids TEXT,
+    status TEXT NOT NULL,
+    result INTEGER,
+    trace_id TEXT,
+    book_slot INTEGER,
+    book_width INTEGER,
+    is_redeemed INTEGER NOT NULL DEFAULT 0,
+    redemption TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tickets_by_owner ON tickets (ticket_owner);
+CREATE INDEX IF NOT EXISTS tickets_by_wallet ON tickets (wallet_id);
+CREATE INDEX IF NOT EXISTS tickets_by_store ON tickets (store_id);
+"""
+
+# Write-back of an accepted ticket, until the issuer store holds is_redeemed = 1
+REDEEMING = 'pending'
+REDEEM_FAILED = 'failed'
+
+# Lifecycle of an indexed ticket
+ISSUED = 'issued'
+# Claim stored ahead of the gate by the holder's app
+PRESTAGED = 'prestaged'
+CLAIMED = 'claimed'
+VERIFIED = 'verified'
+
+
+class TicketIndex:
+    """SQLite (WAL) map of ticket_id -> issuer store, program, redemption stores and status"""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("TICKET_INDEX_DB", data_path("ticket_index.sqlite3"))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._local = threading.local()
+        # One thread does every write from the event loop, in submission order, on its own connection
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ticket-index-writer")
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+            # Indexes created before tickets carried a trace id, a book slot and width or redemption state
+            columns = {row['name'] for row in connection.execute("PRAGMA table_info(tickets)")}
+            for column, definition in (
+                ('trace_id', 'TEXT'),
+                ('book_slot', 'INTEGER'),
+                ('book_width', 'INTEGER'),
+                ('is_redeemed', 'INTEGER NOT NULL DEFAULT 0'),
+                ('redemption', 'TEXT'),
+            ):
+                if column not in columns:
+                    connection.execute(f"ALTER TABLE tickets ADD COLUMN {column} {definition}")
+
+    def _connection(self):
+        # SQLite connections are per thread; WAL lets readers run alongside the single writer
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    async def _run(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, partial(method, *args, **kwargs))
+
+    async def write(self, record, *args, **kwargs):
+        """Run `record` (one of the record_* methods) on the writer thread, keeping the event loop free"""
+        return await self._run(record, *args, **kwargs)
+
+    async def read(self, query, *args, **kwargs):
+        """Run `query` (get, by_store, ...) on the writer thread, so it also sees every write submitted before it"""
+        return await self._run(query, *args, **kwargs)
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+    def record_issued(self, ticket_id, ticket_owner, user_id, store_id, program_id=None, trace_id=None,
+                      is_redeemed=0, book_slot=None, book_width=None):
+        self._connection().execute(
+            "INSERT INTO tickets (ticket_id, ticket_owner, user_id, store_id, program_id, status, trace_id, "
+            "book_slot, book_width, is_redeemed, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (ticket_id) DO UPDATE SET ticket_owner = excluded.ticket_owner, "
+            "user_id = excluded.user_id, store_id = excluded.store_id, program_id = excluded.program_id, "
+            "wallet_id = NULL, party_ids_to_store_ids = NULL, status = excluded.status, result = NULL, "
+            "trace_id = excluded.trace_id, book_slot = excluded.book_slot, book_width = excluded.book_width, "
+            "is_redeemed = excluded.is_redeemed, "
+            "redemption = NULL, updated_at = excluded.updated_at",
+            (str(ticket_id), str(ticket_owner), user_id, store_id, program_id, ISSUED, trace_id, book_slot,
+             book_width, int(is_redeemed), time.time()),
+        )
+
+    def record_book(self, store_id, user_id, program_id, tickets, width):
+        """Index (ticket_id, ticket_owner, is_redeemed) tickets stored as one `width`-slot book, in one transaction"""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            for slot, (ticket_id, ticket_owner, is_redeemed) in enumerate(tickets):
+                self.record_issued(ticket_id, ticket_owner, user_id, store_id, program_id,
+                                   is_redeemed=is_redeemed, book_slot=slot, book_width=width)
+
+    def record_claim(self, ticket_id, wallet_id, party_ids_to_store_ids, status=CLAIMED):
+        self._connection().execute(
+            "UPDATE tickets SET wallet_id = ?, party_ids_to_store_ids = ?, status = ?, result = NULL, "
+            "updated_at = ? WHERE ticket_id = ?",
+            (str(wallet_id), party_ids_to_store_ids, status, time.time(), str(ticket_id)),
+        )
+
+    def record_result(self, store_id, party_ids_to_store_ids, result):
+        """Store a verify result against the ticket whose issuer store and claim were checked"""
+        self._connection().execute(
+            "UPDATE tickets SET status = ?, result = ?, updated_at = ? "
+            "WHERE store_id = ? AND party_ids_to_store_ids = ?",
+            (VERIFIED, result, time.time(), store_id, party_ids_to_store_ids),
+        )
+
+    def record_scan(self, ticket_id, wallet_id, result):
+        """Store the result of a direct scan, which checks the claim without a redemption store"""
+        # A scan by another wallet must not detach a claim the holder already stored
+        self._connection().execute(
+            "UPDATE tickets SET wallet_id = CASE WHEN party_ids_to_store_ids IS NULL THEN ? ELSE wallet_id END, "
+            "status = ?, result = ?, updated_at = ? WHERE ticket_id = ?",
+            (str(wallet_id), VERIFIED, result, time.time(), str(ticket_id)),
+        )
+
+    def record_redeeming(self, ticket_id, state=REDEEMING):
+        """Note an accepted ticket whose issuer store still has to be marked redeemed, so a restart resumes it"""
+        self._connection().execute(
+            "UPDATE tickets SET redemption = ?, updated_at = ? WHERE ticket_id = ?",
+            (state, time.time(), str(ticket_id)),
+        )
+
+    def record_redeemed(self, ticket_ids):
+        """Note that the issuer store now holds is_redeemed = 1 for these tickets"""
+        self._connection().executemany(
+            "UPDATE tickets SET is_redeemed = 1, redemption = NULL, updated_at = ? WHERE ticket_id = ?",
+            [(time.time(), str(ticket_id)) for ticket_id in ticket_ids],
+        )
+
+    def unwritten_redemptions(self):
+        """Accepted tickets whose write-back is pending or gave up"""
+        rows = self._connection().execute(
+            "SELECT * FROM tickets WHERE redemption IS NOT NULL"
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, ticket_id):
+        row = self._connection().execute(
+            "SELECT * FROM tickets WHERE ticket_id = ?", (str(ticket_id),)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def by_store(self, store_id):
+        row = self._connection().execute(
+            "SELECT * FROM tickets WHERE store_id = ?", (store_id,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def book_tickets(self, store_id):
+        """Tickets of the book stored at `store_id`, in slot order"""
+        rows = self._connection().execute(
+            "SELECT * FROM tickets WHERE store_id = ? AND book_slot IS NOT NULL ORDER BY book_slot", (store_id,)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def by_wallet(self, wallet_id):
+        """Tickets owned by or claimed with `wallet_id`"""
+        rows = self._connection().execute(
+            "SELECT * FROM tickets WHERE ticket_owner = ? UNION SELECT * FROM tickets WHERE wallet_id = ?",
+            (str(wallet_id), str(wallet_id)),
+        ).fetchall()
+        return [dict(row) for row in rows]
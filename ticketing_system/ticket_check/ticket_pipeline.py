@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+from ticket_service import TicketService
+
+if os.getenv("NILLION_FAKE_CLUSTER"):
+    # Offline mode for replays: an in-memory stand-in for the devnet and nilchain
+    import fake_nillion
+    fake_nillion.install()
+
+STAGES = ('issue', 'redeem', 'verify')
+# Claims go into the compute as compute-time secrets, so there is no redeem store
+DIRECT_STAGES = ('issue', 'scan')
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Issue, redeem and verify tickets read as JSONL from stdin, writing one JSONL result per ticket"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Workers per stage",
+    )
+    parser.add_argument(
+        "--queue_size",
+        type=int,
+        default=32,
+        help="Tickets buffered between two stages before the earlier stage waits",
+    )
+    parser.add_argument(
+        "--direct",
+        action="store_true",
+        help="Check each claim in one compute instead of redeeming into a user store and verifying",
+    )
+    return parser.parse_args(args)
+
+
+class Pipeline:
+    """issue -> redeem -> verify over bounded queues; a ticket that fails a stage skips to the output"""
+
+    def __init__(self, service: TicketService, output, concurrency=8, queue_size=32, stages=STAGES):
+        self.service = service
+        self.output = output
+        self.concurrency = concurrency
+        self.stages = stages
+        self.queues = {stage: asyncio.Queue(maxsize=queue_size) for stage in stages}
+        self.results = asyncio.Queue(maxsize=queue_size)
+        self.completed = 0
+        self.failed = 0
+
+    async def issue(self, record):
+        issued = await self.service.issue_ticket(
+            record['ticket_id'],
+            record['ticket_owner'],
+            record.get('is_redeemed') or 0
+        )
+        record.update(issued)
+
+    async def redeem(self, record):
+        redeemed = await self.service.redeem_ticket(
+            record['user_id'],
+            record['store_id'],
+            record['ticket_id'],
+            record['wallet_id']
+        )
+        record['party_ids_to_store_ids'] = redeemed['party_ids_to_store_ids']
+
+    async def verify(self, record):
+        result = await self.service.verify_ticket(record['store_id'], record['party_ids_to_store_ids'])
+        record['status'] = result.get('status')
+
+    async def scan(self, record):
+        scanned = await self.service.scan_ticket(record['ticket_id'], record['wallet_id'], record['store_id'])
+        record['status'] = scanned['result'].get('status')
+
+    async def worker(self, stage, next_queue):
+        step = getattr(self, stage)
+        queue = self.queues[stage]
+        while (record := await queue.get()) is not None:
+            started = time.perf_counter()
+            try:
+                await step(record)
+            except Exception as e:
+                record['error'] = f"{stage}: {str(e)}"
+            record.setdefault('seconds', {})[stage] = round(time.perf_counter() - started, 6)
+            await (self.results if 'error' in record else next_queue).put(record)
+
+    async def writer(self):
+        while (record := await self.results.get()) is not None:
+            if 'error' in record:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self.output.write(json.dumps(record) + '\n')
+            self.output.flush()
+
+    async def run(self, records):
+        """Feed `records` (an async iterator of dicts) through every stage and wait for the last result"""
+        writing = asyncio.create_task(self.writer())
+        stage_workers = []
+        for stage, next_stage in zip(self.stages, self.stages[1:] + (None,)):
+            next_queue = self.queues[next_stage] if next_stage else self.results
+            stage_workers.append([
+                asyncio.create_task(self.worker(stage, next_queue)) for _ in range(self.concurrency)
+            ])
+
+        async for record in records:
+            await self.queues[self.stages[0]].put(record)
+
+        # Drain stage by stage so every ticket has left a stage before its workers stop
+        for stage, workers in zip(self.stages, stage_workers):
+            for _ in workers:
+                await self.queues[stage].put(None)
+            await asyncio.gather(*workers)
+        await self.results.put(None)
+        await writing
+
+
+async def read_records(stream):
+    """Ticket records from JSONL lines on `stream`, read off the event loop"""
+    loop = asyncio.get_running_loop()
+    while line := await loop.run_in_executor(None, stream.readline):
+        if line.strip():
+            yield json.loads(line)
+
+
+async def main(args=None):
+    parsed_args = parse_args(args)
+    service = TicketService()
+    await service.start()
+    pipeline = Pipeline(
+        service,
+        sys.stdout,
+        parsed_args.concurrency,
+        parsed_args.queue_size,
+        DIRECT_STAGES if parsed_args.direct else STAGES,
+    )
+    started = time.monotonic()
+    # The ticket classes print their progress; keep stdout for the JSONL results only
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            await pipeline.run(read_records(sys.stdin))
+        finally:
+            await service.close()
+
+    elapsed = time.monotonic() - started
+    print(
+        f"{pipeline.completed} verified, {pipeline.failed} failed in {elapsed:.1f}s "
+        f"- {pipeline.completed / elapsed if elapsed else 0.0:.2f} tickets/s",
+        file=sys.stderr,
+    )
+    return 1 if pipeline.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,34 +1,8 @@
-import asyncio
-import os
-import argparse
-from dataclasses import dataclass
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
+from metrics import timed
 
 
 class TicketRedemption:
@@ -38,10 +12,7 @@ class TicketRedemption:
         self.user_wallet = user_wallet
 
         # Initialize client
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
 
         # Get IDs from client
         self.user_id = self.client.user_id
@@ -54,15 +25,11 @@ class TicketRedemption:
         print(f"Initialized with Party ID: {self.party_id}")
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
-
-    async def store_user_secrets(self, issuer_user_id: str, payments_client, payments_wallet):
+        with timed('setup_payments'):
+            return create_payments(self.config)
+
+    async def store_user_secrets(self, issuer_user_id: str, payments_client, payments_wallet, pay=None):
+        pay = pay or get_quote_and_pay
         try:
             program_id = f"{issuer_user_id}/{self.config.program_name}"
             print(f"Using program ID: {program_id}")
@@ -81,7 +48,7 @@ class TicketRedemption:
             })
 
             # Get quote and pay
-            receipt = await get_quote_and_pay(
+            receipt = await pay(
                 self.client,
                 nillion.Operation.store_values(stored_secret, ttl_days=5),
                 payments_wallet,
@@ -97,12 +64,14 @@ class TicketRedemption:
             print(f"Permissions set for user: {issuer_user_id}")
 
             # Store values
-            store_id = await self.client.store_values(
-                self.config.cluster_id,
-                stored_secret,
-                permissions,
-                receipt
-            )
+            with timed('store_values') as stage:
+                store_id = await self.client.store_values(
+                    self.config.cluster_id,
+                    stored_secret,
+                    permissions,
+                    receipt
+                )
+                stage.set('store_id', store_id)
             print(f"Received store_id: {store_id}")
 
             # Store the single store_id
@@ -0,0 +1,536 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import replace
+import py_nillion_client as nillion
+
+from client_registry import get_client, registry
+from metrics import timed
+from nillion_config import NillionConfig, create_payments
+from payment_batcher import PaymentBatcher
+from program_registry import forget_program, program_missing
+from receipt_pool import ReceiptPool
+from redemption_writer import REDEEMED, RedemptionWriter
+from single_flight import SingleFlight
+from ticket_index import CLAIMED, PRESTAGED, REDEEM_FAILED, TicketIndex
+from ticket_storage import TicketStorage
+from ticket_redemption import TicketRedemption
+from ticket_computation import BATCH_WIDTHS, TicketComputation
+from verify_cache import VerifyCache
+import tracing
+
+
+class EventLoopThread:
+    """Long-lived event loop on a daemon thread, so sync callers can run coroutines on it"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="ticket-service-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro, timeout=None):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+class TicketService:
+    """Issue, redeem and verify tickets in-process with structured return values"""
+
+    def __init__(self, config: NillionConfig = None):
+        self.config = config or NillionConfig.from_env()
+        self._payments = None
+        self._wallet_pool = None
+        self._batcher = None
+        self.compute_timeout = float(os.getenv("TICKET_COMPUTE_TIMEOUT", "120"))
+        self._program_lock = asyncio.Lock()
+        # Program path -> when its registry entry was last dropped because the cluster lost it
+        self._programs_forgotten = {}
+        self.book_width = int(os.getenv("TICKET_BOOK_WIDTH", "32"))
+        # Book store_id -> lock, so slot write-backs to one book never overwrite each other
+        self._book_locks = {}
+        self.index = TicketIndex()
+        self.in_flight = SingleFlight()
+        self.verify_cache = VerifyCache(
+            maxsize=int(os.getenv("TICKET_VERIFY_CACHE_SIZE", "1024")),
+            ttl=float(os.getenv("TICKET_VERIFY_CACHE_TTL", "30")),
+        )
+        self.redemptions = RedemptionWriter(
+            self._write_redeemed,
+            window=int(os.getenv("TICKET_REDEEM_FLUSH_MS", "250")) / 1000,
+            max_batch=int(os.getenv("TICKET_REDEEM_FLUSH_MAX", "32")),
+            max_attempts=int(os.getenv("TICKET_REDEEM_MAX_ATTEMPTS", "5")),
+            backoff=int(os.getenv("TICKET_REDEEM_BACKOFF_MS", "500")) / 1000,
+            give_up=self._redeem_failed,
+        )
+        self.receipts = ReceiptPool(
+            self.pay_quote,
+            self.config.cluster_id,
+            size=int(os.getenv("TICKET_RECEIPT_POOL_SIZE", "0")),
+        )
+
+    async def start(self):
+        """Resume unfinished write-backs, register the common operation shapes and start background refills"""
+        await self._resume_redemptions()
+        if self.receipts.size <= 0:
+            return
+        issuer = get_client(self.config.seed, self.config.cluster_id)
+        # Redemptions run under the configured seed too, so the same client buys their receipts
+        user = get_client(self.config.seed, self.config.cluster_id)
+        program_id = f"{issuer.user_id}/{self.config.program_name}"
+
+        issuer_values = nillion.NadaValues({
+            k: nillion.SecretInteger(0) for k in ('ticket_id', 'ticket_owner', 'is_redeemed')
+        })
+        user_values = nillion.NadaValues({
+            k: nillion.SecretInteger(0) for k in ('user_ticket', 'user_wallet', 'user_redeem')
+        })
+        self.receipts.register('issuer_store', issuer, nillion.Operation.store_values(issuer_values, ttl_days=5))
+        self.receipts.register('user_store', user, nillion.Operation.store_values(user_values, ttl_days=5))
+        self.receipts.register('compute', issuer, nillion.Operation.compute(program_id, nillion.NadaValues({})))
+        self.receipts.register('direct_compute', issuer, nillion.Operation.compute(program_id, user_values))
+        self.receipts.start()
+
+    async def close(self):
+        await self.redemptions.close()
+        await self.receipts.close()
+        if self._batcher is not None:
+            await self._batcher.close()
+        await asyncio.to_thread(self.index.close)
+
+    def stats(self):
+        """Counters of the service's caches and pools, for the metrics endpoint"""
+        stats = {
+            'clients': registry.stats(),
+            'receipts': self.receipts.stats(),
+            'verify_cache': self.verify_cache.stats(),
+            'in_flight': self.in_flight.stats(),
+            'redemptions': self.redemptions.stats(),
+        }
+        if self._batcher is not None:
+            stats['payment_batches'] = self._batcher.stats()
+        if self._wallet_pool is not None:
+            stats['wallets'] = self._wallet_pool.stats()
+        return stats
+
+    def setup_payments(self):
+        # One ledger client and wallet for the lifetime of the service
+        if self._payments is None:
+            with timed('setup_payments'):
+                self._payments = create_payments(self.config)
+        return self._payments
+
+    def wallet_pool(self):
+        # Every funded NILLION_NILCHAIN_PRIVATE_KEY_<n> signs payments, not just key 0
+        if self._wallet_pool is None:
+            from wallet_pool import WalletPool
+            payments_client, _ = self.setup_payments()
+            self._wallet_pool = WalletPool.from_env(payments_client)
+        return self._wallet_pool
+
+    def payment_batcher(self):
+        if self._batcher is None:
+            self._batcher = PaymentBatcher(
+                self.wallet_pool(),
+                self.config.cluster_id,
+                window=int(os.getenv("TICKET_PAYMENT_BATCH_WINDOW_MS", "25")) / 1000,
+                max_batch=int(os.getenv("TICKET_PAYMENT_BATCH_MAX", "32")),
+            )
+        return self._batcher
+
+    async def pay_quote(self, quote):
+        return await self.payment_batcher().pay_quote(quote)
+
+    async def pay(self, client, operation, payments_wallet=None, payments_client=None, cluster_id=None):
+        """Drop-in for get_quote_and_pay that pays in the next batch transaction without blocking the loop"""
+        with timed('get_quote_and_pay'):
+            quote = await client.request_price_quote(self.config.cluster_id, operation)
+            return await self.pay_quote(quote)
+
+    async def _with_receipt(self, shape, operation):
+        """Run `operation(pay)` with a pooled receipt, repaying inline if the network rejects it"""
+        pay = self.receipts.payer(shape, self.pay)
+        try:
+            return await operation(pay)
+        except nillion.PaymentError:
+            if not pay.used_pooled:
+                raise
+            self.receipts.reject(shape)
+            return await operation(self.pay)
+
+    def _program_storage(self, program_name=None):
+        config = replace(self.config, program_name=program_name) if program_name else self.config
+        return TicketStorage(config, None, None, None)
+
+    async def ensure_program(self, program_name=None):
+        """Store a program at most once; concurrent issuers wait for the first upload instead of paying again"""
+        storage = self._program_storage(program_name)
+        payments_client, payments_wallet = self.setup_payments()
+        async with self._program_lock:
+            return await storage.store_program(payments_client, payments_wallet, pay=self.pay)
+
+    async def _with_program(self, operation, program_name=None):
+        """Run a compute, storing its program again once if the cluster no longer has it (e.g. a devnet reset)"""
+        started = time.monotonic()
+        try:
+            return await operation()
+        except (nillion.ProgramError, nillion.ComputeError) as e:
+            if not program_missing(e):
+                raise
+            storage = self._program_storage(program_name)
+            # Computes that failed before another one dropped the stale entry just wait for its upload
+            if self._programs_forgotten.get(storage.program_path, 0) < started:
+                print(f"Program {storage.config.program_name} is missing from the cluster, storing it again")
+                forget_program(storage.program_path, self.config.cluster_id, storage.user_id)
+                self._programs_forgotten[storage.program_path] = time.monotonic()
+        await self.ensure_program(program_name)
+        return await operation()
+
+    async def issue_ticket(self, ticket_id, ticket_owner, is_redeemed=0):
+        # The ticket's trace starts here; redeem and verify continue it through the trace_id in the index
+        with tracing.start_span('issue_ticket', ticket_id=str(ticket_id)) as span:
+            storage = TicketStorage(self.config, int(ticket_id), int(ticket_owner), int(is_redeemed))
+            payments_client, payments_wallet = self.setup_payments()
+
+            program_id = await self.ensure_program()
+            store_id = await self._with_receipt(
+                'issuer_store',
+                lambda pay: storage.store_secrets(program_id, payments_client, payments_wallet, pay=pay)
+            )
+            span.set('store_id', store_id)
+            await self.index.write(
+                self.index.record_issued,
+                ticket_id, ticket_owner, storage.user_id, store_id, program_id, span.trace_id, is_redeemed
+            )
+
+        return {
+            'user_id': storage.user_id,
+            'store_id': store_id,
+        }
+
+    async def get_ticket(self, ticket_id):
+        """Index row of a ticket, or None when it was never issued"""
+        return await self.index.read(self.index.get, ticket_id)
+
+    async def wallet_tickets(self, wallet_id):
+        return await self.index.read(self.index.by_wallet, wallet_id)
+
+    async def lookup_ticket(self, ticket_id):
+        ticket = await self.get_ticket(ticket_id)
+        if ticket is None:
+            raise LookupError(f"Unknown ticket {ticket_id}")
+        return ticket
+
+    async def _trace_id(self, ticket_id=None, store_id=None):
+        """trace_id recorded when the ticket was issued; the index is only read while spans are recorded"""
+        if not tracing.enabled():
+            return None
+        if ticket_id is not None:
+            ticket = await self.index.read(self.index.get, ticket_id)
+        else:
+            ticket = await self.index.read(self.index.by_store, store_id)
+        return ticket['trace_id'] if ticket is not None else None
+
+    async def redeem_ticket(self, user_id, store_id, ticket_id, wallet_id):
+        """Store the holder's claim; user_id and store_id may be None to take them from the ticket index"""
+        trace_id = await self._trace_id(ticket_id=ticket_id)
+        with tracing.start_span('redeem_ticket', trace_id, ticket_id=str(ticket_id), store_id=store_id):
+            # A double-fired scan or client retry joins the redemption already in flight instead of paying again
+            return await self.in_flight.run(
+                ('redeem', str(ticket_id), str(wallet_id)),
+                lambda: self._redeem_ticket(user_id, store_id, ticket_id, wallet_id)
+            )
+
+    async def _redeem_ticket(self, user_id, store_id, ticket_id, wallet_id, status=CLAIMED):
+        if user_id is None or store_id is None:
+            ticket = await self.lookup_ticket(ticket_id)
+            user_id, store_id = ticket['user_id'], ticket['store_id']
+        redemption = TicketRedemption(self.config, int(ticket_id), int(wallet_id))
+        payments_client, payments_wallet = self.setup_payments()
+
+        _, party_store_mapping = await self._with_receipt(
+            'user_store',
+            lambda pay: redemption.store_user_secrets(user_id, payments_client, payments_wallet, pay=pay)
+        )
+        await self.index.write(self.index.record_claim, ticket_id, wallet_id, party_store_mapping, status)
+        # A new claim changes what the issuer store verifies against
+        self.verify_cache.invalidate(store_id)
+
+        return {
+            'store_id': store_id,
+            'party_ids_to_store_ids': party_store_mapping,
+        }
+
+    async def verify_ticket(self, store_id, party_ids_to_store_ids):
+        trace_id = await self._trace_id(store_id=store_id)
+        with tracing.start_span('verify_ticket', trace_id, store_id=store_id) as span:
+            result = await self.in_flight.run(
+                ('verify', store_id, tuple(sorted(party_ids_to_store_ids.split()))),
+                lambda: self._verify_ticket(store_id, party_ids_to_store_ids),
+                follow=self._redeemed_by_leader
+            )
+            span.set('status', result.get('status'))
+            return result
+
+    async def _verify_ticket(self, store_id, party_ids_to_store_ids):
+        computation = TicketComputation(self.config)
+        payments_client, payments_wallet = self.setup_payments()
+
+        if self.redemptions.pending(store_id):
+            # Accepted moments ago; the issuer store is not marked redeemed yet
+            return {'status': REDEEMED}
+
+        party_store_mapping = computation.parse_party_store_ids(party_ids_to_store_ids.split())
+        # Rescans and scanner retries of the same claim reuse the last result instead of paying for a compute
+        result = self.verify_cache.get(store_id, party_store_mapping)
+        if result is not None:
+            return dict(result)
+
+        result = await self._with_program(lambda: self._with_receipt(
+            'compute',
+            lambda pay: computation.perform_computation(
+                store_id,
+                party_store_mapping,
+                payments_client,
+                payments_wallet,
+                pay=pay,
+                timeout=self.compute_timeout
+            )
+        ))
+        self.verify_cache.put(store_id, party_store_mapping, result)
+        await self.index.write(self.index.record_result, store_id, party_ids_to_store_ids, result.get('status'))
+        return await self._settle(store_id, result)
+
+    @staticmethod
+    def _redeemed_by_leader(result):
+        # The ticket is admitted once: a duplicate scan that joined an accepting one sees it as redeemed
+        return {'status': REDEEMED} if result.get('status') == 1 else result
+
+    def _redemption_key(self, ticket):
+        # A ticket book is written back slot by slot
+        if ticket['book_slot'] is None:
+            return ticket['store_id']
+        return ticket['store_id'], ticket['book_slot']
+
+    async def _settle(self, store_id, result, ticket_id=None):
+        """Queue an accepted ticket to be marked redeemed; a second acceptance racing the first is turned down"""
+        if result.get('status') != 1:
+            return result
+        if ticket_id is None:
+            ticket = await self.index.read(self.index.by_store, store_id)
+        else:
+            ticket = await self.index.read(self.index.get, ticket_id)
+        if ticket is None:
+            return result
+        # A compute that started before an earlier acceptance was written back still saw is_redeemed = 0
+        if ticket['is_redeemed'] or ticket['redemption'] is not None:
+            return {'status': REDEEMED}
+        key = self._redemption_key(ticket)
+        if self.redemptions.pending(key):
+            return {'status': REDEEMED}
+        # Recorded before the holder is let in, so a restart still writes the redemption back
+        await self.index.write(self.index.record_redeeming, ticket['ticket_id'])
+        if not self.redemptions.mark(key, ticket):
+            return {'status': REDEEMED}
+        # Cached acceptances of this ticket must not outlive the scan that used it
+        self.verify_cache.invalidate(store_id)
+        return result
+
+    async def _redeem_failed(self, key, ticket):
+        await self.index.write(self.index.record_redeeming, ticket['ticket_id'], REDEEM_FAILED)
+
+    async def _resume_redemptions(self):
+        """Queue the write-backs a previous run accepted but did not finish"""
+        for ticket in await self.index.read(self.index.unwritten_redemptions):
+            self.redemptions.mark(self._redemption_key(ticket), ticket)
+
+    async def _write_redeemed(self, key, ticket):
+        if ticket['book_slot'] is not None:
+            return await self._write_book(ticket['store_id'])
+        store_id = ticket['store_id']
+        storage = TicketStorage(self.config, int(ticket['ticket_id']), int(ticket['ticket_owner']), 1)
+        payments_client, payments_wallet = self.setup_payments()
+        await storage.update_secrets(store_id, payments_client, payments_wallet, pay=self.pay)
+        await self.index.write(self.index.record_redeemed, [ticket['ticket_id']])
+        # Results computed before the update saw is_redeemed = 0
+        self.verify_cache.invalidate(store_id)
+
+    async def _write_book(self, store_id):
+        """Rewrite a ticket book with every slot accepted so far marked redeemed"""
+        lock = self._book_locks.setdefault(store_id, asyncio.Lock())
+        async with lock:
+            tickets = await self.index.read(self.index.book_tickets, store_id)
+            width = tickets[0]['book_width']
+            redeemed = [
+                ticket['ticket_id'] for ticket in tickets
+                if ticket['is_redeemed'] or self.redemptions.pending((store_id, ticket['book_slot']))
+            ]
+            records = [
+                (ticket['ticket_id'], ticket['ticket_owner'], int(ticket['ticket_id'] in redeemed))
+                for ticket in tickets
+            ]
+            storage = TicketStorage(self.config, None, None, None)
+            payments_client, payments_wallet = self.setup_payments()
+            await storage.update_ticket_book(
+                store_id, records, width, payments_client, payments_wallet, pay=self.pay
+            )
+            await self.index.write(self.index.record_redeemed, redeemed)
+
+    async def verify_ticket_id(self, ticket_id):
+        """Verify the latest claim on a ticket from the index, so a gate scan needs only the ticket number"""
+        ticket = await self.lookup_ticket(ticket_id)
+        if ticket['party_ids_to_store_ids'] is None:
+            raise ValueError(f"Ticket {ticket_id} has not been redeemed")
+        result = await self.verify_ticket(ticket['store_id'], ticket['party_ids_to_store_ids'])
+
+        return {
+            'store_id': ticket['store_id'],
+            'party_ids_to_store_ids': ticket['party_ids_to_store_ids'],
+            'result': result,
+        }
+
+    async def scan_ticket(self, ticket_id, wallet_id, store_id=None):
+        """Check a claim in one compute, with the holder's inputs as compute-time secrets instead of a user store"""
+        trace_id = await self._trace_id(ticket_id=ticket_id)
+        with tracing.start_span('scan_ticket', trace_id, ticket_id=str(ticket_id), store_id=store_id) as span:
+            result = await self.in_flight.run(
+                ('scan', str(ticket_id), str(wallet_id)),
+                lambda: self._scan_ticket(ticket_id, wallet_id, store_id),
+                follow=lambda scanned: {**scanned, 'result': self._redeemed_by_leader(scanned['result'])}
+            )
+            span.set('status', result['result'].get('status'))
+            return result
+
+    async def _scan_ticket(self, ticket_id, wallet_id, store_id):
+        if store_id is None:
+            store_id = (await self.lookup_ticket(ticket_id))['store_id']
+        if self.redemptions.pending(store_id):
+            return {
+                'store_id': store_id,
+                'result': {'status': REDEEMED},
+            }
+        computation = TicketComputation(self.config)
+        payments_client, payments_wallet = self.setup_payments()
+
+        # Keyed like a redemption mapping so a redeem on the store invalidates it too
+        claim = {'user_ticket': str(ticket_id), 'user_wallet': str(wallet_id)}
+        result = self.verify_cache.get(store_id, claim)
+        if result is None:
+            result = await self._with_program(lambda: self._with_receipt(
+                'direct_compute',
+                lambda pay: computation.perform_direct_computation(
+                    store_id,
+                    ticket_id,
+                    wallet_id,
+                    payments_client,
+                    payments_wallet,
+                    pay=pay,
+                    timeout=self.compute_timeout
+                )
+            ))
+            self.verify_cache.put(store_id, claim, result)
+            await self.index.write(self.index.record_scan, ticket_id, wallet_id, result.get('status'))
+            result = await self._settle(store_id, result)
+
+        return {
+            'store_id': store_id,
+            'result': dict(result),
+        }
+
+    async def prestage_ticket(self, ticket_id, wallet_id):
+        """Store the holder's claim before they reach the gate, so the scan there is a single compute"""
+        ticket = await self.lookup_ticket(ticket_id)
+        if ticket['party_ids_to_store_ids'] is not None and ticket['wallet_id'] == str(wallet_id):
+            # The holder's app re-opened; the stored claim is still good, so do not pay for another
+            return {
+                'store_id': ticket['store_id'],
+                'party_ids_to_store_ids': ticket['party_ids_to_store_ids'],
+            }
+
+        with tracing.start_span('prestage_ticket', ticket['trace_id'], ticket_id=str(ticket_id)):
+            return await self.in_flight.run(
+                ('redeem', str(ticket_id), str(wallet_id)),
+                lambda: self._redeem_ticket(ticket['user_id'], ticket['store_id'], ticket_id, wallet_id, PRESTAGED)
+            )
+
+    async def gate_scan(self, ticket_id, wallet_id):
+        """Verify a pre-staged claim with one compute, or check the claim directly when nothing was staged"""
+        ticket = await self.lookup_ticket(ticket_id)
+        # Any stored claim by this holder will do, whether pre-staged or redeemed through /api/redeem
+        if ticket['party_ids_to_store_ids'] is not None and ticket['wallet_id'] == str(wallet_id):
+            result = await self.verify_ticket(ticket['store_id'], ticket['party_ids_to_store_ids'])
+            return {
+                'store_id': ticket['store_id'],
+                'prestaged': True,
+                'result': result,
+            }
+
+        scanned = await self.scan_ticket(ticket_id, wallet_id, ticket['store_id'])
+        return {**scanned, 'prestaged': False}
+
+    async def issue_ticket_book(self, tickets, width=None):
+        """Store (ticket_id, ticket_owner, is_redeemed) tickets as one book: one quote, payment and store for all"""
+        width = width or self.book_width
+        if width not in BATCH_WIDTHS:
+            raise ValueError(f"Ticket books come in widths {BATCH_WIDTHS}, got {width}")
+        storage = TicketStorage(self.config, None, None, None)
+        payments_client, payments_wallet = self.setup_payments()
+
+        program_id = await self.ensure_program(f"{self.config.program_name}_batch_{width}")
+        store_id = await storage.store_ticket_book(
+            tickets,
+            width,
+            program_id,
+            payments_client,
+            payments_wallet,
+            pay=self.pay
+        )
+        await self.index.write(self.index.record_book, store_id, storage.user_id, program_id, tickets, width)
+
+        return {
+            'user_id': storage.user_id,
+            'store_id': store_id,
+            'slots': {str(ticket_id): slot for slot, (ticket_id, _, _) in enumerate(tickets)},
+        }
+
+    async def verify_book_claims(self, claims):
+        """Statuses for (ticket_id, wallet_id) claims on booked tickets, one compute per book touched"""
+        computation = TicketComputation(self.config)
+        payments_client, payments_wallet = self.setup_payments()
+
+        books = {}
+        for i, (ticket_id, wallet_id) in enumerate(claims):
+            booked = await self.index.read(self.index.get, ticket_id)
+            if booked is None or booked['book_slot'] is None:
+                raise KeyError(f"Ticket {ticket_id} is not in any ticket book")
+            store_id, slot, width = booked['store_id'], booked['book_slot'], booked['book_width']
+            slots = books.setdefault((store_id, width), {})
+            if slot in slots:
+                raise ValueError(f"Ticket {ticket_id} is claimed more than once")
+            slots[slot] = (i, (ticket_id, wallet_id))
+
+        async def check_book(store_id, width, slots):
+            # Slots accepted moments ago are not marked redeemed in the book yet
+            statuses = {slot: REDEEMED for slot in slots if self.redemptions.pending((store_id, slot))}
+            claims = {slot: claim for slot, (_, claim) in slots.items() if slot not in statuses}
+            if claims:
+                computed = await self._with_program(lambda: computation.perform_book_computation(
+                    store_id,
+                    width,
+                    claims,
+                    payments_client,
+                    payments_wallet,
+                    pay=self.pay,
+                    timeout=self.compute_timeout
+                ), f"{self.config.program_name}_batch_{width}")
+                for slot, status in computed.items():
+                    ticket_id, wallet_id = claims[slot]
+                    await self.index.write(self.index.record_scan, ticket_id, wallet_id, status)
+                    statuses[slot] = (await self._settle(store_id, {'status': status}, ticket_id))['status']
+            return {i: statuses[slot] for slot, (i, _) in slots.items()}
+
+        results = {}
+        for statuses in await asyncio.gather(*(
+            check_book(store_id, width, slots) for (store_id, width), slots in books.items()
+        )):
+            results.update(statuses)
+        return [results[i] for i in range(len(claims))]
@@ -1,43 +1,15 @@
-import asyncio
-import os
-from dataclasses import dataclass
 import py_nillion_client as nillion
-from py_nillion_client import NodeKey, UserKey
-from dotenv import load_dotenv
-from cosmpy.aerial.client import LedgerClient
-from cosmpy.aerial.wallet import LocalWallet
-from cosmpy.crypto.keypairs import PrivateKey
-from nillion_python_helpers import get_quote_and_pay, create_nillion_client, create_payments_config
-import pytest
-
-
-
-@dataclass
-class NillionConfig:
-    cluster_id: str
-    grpc_endpoint: str
-    chain_id: str
-    program_name: str = 'ticket_check'
-    seed: str = "seed"
-
-    @classmethod
-    def from_env(cls):
-        home = os.getenv("HOME")
-        load_dotenv(f"{home}/.config/nillion/nillion-devnet.env")
-        return cls(
-            cluster_id=os.getenv("NILLION_CLUSTER_ID"),
-            grpc_endpoint=os.getenv("NILLION_NILCHAIN_GRPC"),
-            chain_id=os.getenv("NILLION_NILCHAIN_CHAIN_ID")
-        )
+
+from client_registry import get_client
+from nillion_config import NillionConfig, create_payments, get_quote_and_pay
+from metrics import timed
+from program_registry import deployed_program_id, record_program
 
 
 class TicketStorage:
     def __init__(self, config: NillionConfig, ticket_id, ticket_owner, is_redeemed):
         self.config = config
-        self.client = create_nillion_client(
-            UserKey.from_seed(config.seed),
-            NodeKey.from_seed(config.seed)
-        )
+        self.client = get_client(config.seed, config.cluster_id)
         self.user_id = self.client.user_id
         self.program_path = f"../nada_programs/target/{config.program_name}.nada.bin"
         self.ticket_id = ticket_id
@@ -45,17 +17,19 @@ class TicketStorage:
         self.is_redeemed = is_redeemed
 
     def setup_payments(self):
-        payments_config = create_payments_config(self.config.chain_id, self.config.grpc_endpoint)
-        payments_client = LedgerClient(payments_config)
-        payments_wallet = LocalWallet(
-            PrivateKey(bytes.fromhex(os.getenv("NILLION_NILCHAIN_PRIVATE_KEY_0"))),
-            prefix="nillion",
-        )
-        return payments_client, payments_wallet
+        with timed('setup_payments'):
+            return create_payments(self.config)
 
-    async def store_program(self, payments_client, payments_wallet):
+    async def store_program(self, payments_client, payments_wallet, pay=None):
+        pay = pay or get_quote_and_pay
         print("-----STORE PROGRAM")
-        receipt = await get_quote_and_pay(
+        # Skip quote, payment and upload when this exact binary is already on the cluster
+        program_id = deployed_program_id(self.program_path, self.config.cluster_id, self.user_id)
+        if program_id is not None:
+            print("Program already stored. program_id:", program_id)
+            return program_id
+
+        receipt = await pay(
             self.client,
             nillion.Operation.store_program(self.program_path),
             payments_wallet,
@@ -63,19 +37,24 @@ class TicketStorage:
             self.config.cluster_id,
         )
 
-        action_id = await self.client.store_program(
-            self.config.cluster_id,
-            self.config.program_name,
-            self.program_path,
-            receipt
-        )
-
         program_id = f"{self.user_id}/{self.config.program_name}"
+        with timed('store_program') as stage:
+            stage.set('program_id', program_id)
+            action_id = await self.client.store_program(
+                self.config.cluster_id,
+                self.config.program_name,
+                self.program_path,
+                receipt
+            )
+            stage.set('action_id', action_id)
+
         print("Stored program. action_id:", action_id)
         print("Stored program_id:", program_id)
+        record_program(self.program_path, self.config.cluster_id, self.user_id, program_id)
         return program_id
 
-    async def store_secrets(self, program_id, payments_client, payments_wallet):
+    async def store_secrets(self, program_id, payments_client, payments_wallet, pay=None):
+        pay = pay or get_quote_and_pay
         print("-----STORE SECRETS")
         secrets = {
             'ticket_id': self.ticket_id,
@@ -89,7 +68,7 @@ class TicketStorage:
             k: nillion.SecretInteger(v) for k, v in secrets.items()
         })
 
-        receipt = await get_quote_and_pay(
+        receipt = await pay(
             self.client,
             nillion.Operation.store_values(stored_secret, ttl_days=5),
             payments_wallet,
@@ -97,14 +76,107 @@ class TicketStorage:
             self.config.cluster_id,
         )
 
-        store_id = await self.client.store_values(
-            self.config.cluster_id,
-            stored_secret,
-            permissions,
-            receipt
-        )
+        with timed('store_values') as stage:
+            store_id = await self.client.store_values(
+                self.config.cluster_id,
+                stored_secret,
+                permissions,
+                receipt
+            )
+            stage.set('store_id', store_id)
 
         secrets_string = ", ".join(f"{key}: {value}" for key, value in secrets.items())
         print(f"\n🎉1️⃣ Party Issuer stored {secrets_string} at store id: {store_id}")
         return store_id
 
+    async def update_secrets(self, store_id, payments_client, payments_wallet, pay=None):
+        """Overwrite the ticket's values at an existing store_id, e.g. to mark it redeemed"""
+        pay = pay or get_quote_and_pay
+        print(f"-----UPDATE SECRETS at store id: {store_id}")
+        stored_secret = nillion.NadaValues({
+            'ticket_id': nillion.SecretInteger(self.ticket_id),
+            'ticket_owner': nillion.SecretInteger(self.ticket_owner),
+            'is_redeemed': nillion.SecretInteger(self.is_redeemed),
+        })
+
+        receipt = await pay(
+            self.client,
+            nillion.Operation.update_values(stored_secret, ttl_days=5),
+            payments_wallet,
+            payments_client,
+            self.config.cluster_id,
+        )
+
+        with timed('update_values') as stage:
+            stage.set('store_id', store_id)
+            update_id = await self.client.update_values(
+                self.config.cluster_id,
+                store_id,
+                stored_secret,
+                receipt
+            )
+        return update_id
+
+    def book_values(self, tickets, width) -> nillion.NadaValues:
+        """One array per field, in the layout of the ticket_check_batch_<width> Issuer inputs"""
+        # Empty slots are stored as redeemed so no claim ever matches them
+        records = list(tickets) + [(0, 0, 1)] * (width - len(tickets))
+        return nillion.NadaValues({
+            name: nillion.Array([nillion.SecretInteger(int(record[field])) for record in records])
+            for field, name in enumerate(('ticket_ids', 'ticket_owners', 'is_redeemed'))
+        })
+
+    async def store_ticket_book(self, tickets, width, program_id, payments_client, payments_wallet, pay=None):
+        """Store up to `width` (ticket_id, ticket_owner, is_redeemed) records under one store_id, one per slot"""
+        pay = pay or get_quote_and_pay
+        if len(tickets) > width:
+            raise ValueError(f"A book of width {width} holds at most {width} tickets, got {len(tickets)}")
+        print(f"-----STORE TICKET BOOK of {len(tickets)} tickets")
+
+        permissions = nillion.Permissions.default_for_user(self.client.user_id)
+        permissions.add_compute_permissions({self.client.user_id: {program_id}})
+        stored_secret = self.book_values(tickets, width)
+
+        receipt = await pay(
+            self.client,
+            nillion.Operation.store_values(stored_secret, ttl_days=5),
+            payments_wallet,
+            payments_client,
+            self.config.cluster_id,
+        )
+
+        with timed('store_values') as stage:
+            store_id = await self.client.store_values(
+                self.config.cluster_id,
+                stored_secret,
+                permissions,
+                receipt
+            )
+            stage.set('store_id', store_id)
+
+        print(f"\n🎉1️⃣ Party Issuer stored a book of {len(tickets)} tickets at store id: {store_id}")
+        return store_id
+
+    async def update_ticket_book(self, store_id, tickets, width, payments_client, payments_wallet, pay=None):
+        """Overwrite a ticket book with its (ticket_id, ticket_owner, is_redeemed) records, e.g. to mark slots redeemed"""
+        pay = pay or get_quote_and_pay
+        print(f"-----UPDATE TICKET BOOK at store id: {store_id}")
+        stored_secret = self.book_values(tickets, width)
+
+        receipt = await pay(
+            self.client,
+            nillion.Operation.update_values(stored_secret, ttl_days=5),
+            payments_wallet,
+            payments_client,
+            self.config.cluster_id,
+        )
+
+        with timed('update_values') as stage:
+            stage.set('store_id', store_id)
+            update_id = await self.client.update_values(
+                self.config.cluster_id,
+                store_id,
+                stored_secret,
+                receipt
+            )
+        return update_id
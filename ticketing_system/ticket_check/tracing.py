@@ -0,0 +1,132 @@
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+# The span code is currently running in; asyncio tasks inherit it from the code that created them
+_current = contextvars.ContextVar('ticket_span', default=None)
+
+
+class JsonlExporter:
+    """Appends one JSON line per finished span; a background thread does the file writes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lines = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread = None
+        atexit.register(self.close)
+
+    def export(self, span):
+        # Spans finish on the event loop, so only the serialization happens here
+        self._lines.put(json.dumps(span.to_dict(), default=str) + '\n')
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as trace_file:
+            closing = False
+            while not closing:
+                lines = [self._lines.get()]
+                # Spans that finished meanwhile go out with the same flush
+                while True:
+                    try:
+                        lines.append(self._lines.get_nowait())
+                    except queue.Empty:
+                        break
+                closing = None in lines
+                trace_file.writelines(line for line in lines if line is not None)
+                trace_file.flush()
+
+    def close(self):
+        """Write the spans still queued and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._lines.put(None)
+            thread.join()
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'start', 'duration', 'error',
+                 '_started', '_token')
+
+    def __init__(self, name, trace_id=None, parent=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id or (parent.trace_id if parent else f"{random.getrandbits(128):032x}")
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent and parent.trace_id == self.trace_id else None
+        self.attributes = attributes or {}
+        self.error = None
+
+    def set(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        exporter.export(self)
+        return False
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': self.duration * 1000,
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+exporter = JsonlExporter(os.getenv("TICKET_TRACE_FILE")) if os.getenv("TICKET_TRACE_FILE") else None
+
+
+def enabled():
+    return exporter is not None
+
+
+def start_span(name, trace_id=None, **attributes):
+    """A child of the current span, or a new root in `trace_id`; a shared no-op when tracing is off"""
+    if exporter is None:
+        return NOOP_SPAN
+    return Span(name, trace_id, _current.get(), attributes)
+
+
+def current_trace_id():
+    span = _current.get()
+    return span.trace_id if span is not None else None
@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VerifyCache:
+    """Bounded LRU of verify results keyed by issuer store_id and the sorted party -> store mapping, with a TTL"""
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._results = OrderedDict()
+        # Issuer store_id -> cache keys, so one ticket's entries can be dropped together
+        self._by_store = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(store_id, party_store_mapping):
+        return store_id, tuple(sorted(party_store_mapping.items()))
+
+    def _drop(self, key):
+        self._results.pop(key, None)
+        keys = self._by_store.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_store[key[0]]
+
+    def get(self, store_id, party_store_mapping):
+        key = self.key(store_id, party_store_mapping)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, store_id, party_store_mapping, result):
+        if self.maxsize <= 0:
+            return
+        key = self.key(store_id, party_store_mapping)
+        with self._lock:
+            self._results[key] = (time.monotonic() + self.ttl, result)
+            self._results.move_to_end(key)
+            self._by_store.setdefault(store_id, set()).add(key)
+            while len(self._results) > self.maxsize:
+                self._drop(next(iter(self._results)))
+                self.evictions += 1
+
+    def invalidate(self, store_id):
+        """Forget every result for an issuer store, e.g. after its ticket's redemption state changed"""
+        with self._lock:
+            for key in list(self._by_store.get(store_id, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._by_store.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._results),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
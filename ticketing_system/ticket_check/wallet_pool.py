@@ -0,0 +1,101 @@
+import os
+import threading
+from cosmpy.aerial.exceptions import BroadcastError
+from cosmpy.aerial.wallet import LocalWallet
+from cosmpy.crypto.address import Address
+from cosmpy.crypto.keypairs import PrivateKey
+
+import nillion_config
+
+
+class PooledWallet:
+    def __init__(self, wallet):
+        self.wallet = wallet
+        self.address = str(Address(wallet.public_key(), "nillion"))
+        self.account = None
+        self.in_flight = 0
+        # Held only while a sequence number is assigned and the transaction is broadcast
+        self.lock = threading.Lock()
+
+
+class WalletPool:
+    """Funded nilchain wallets with locally tracked sequence numbers; each payment goes to the least busy one"""
+
+    def __init__(self, payments_client, wallets):
+        if not wallets:
+            raise ValueError("WalletPool needs at least one wallet")
+        self.payments_client = payments_client
+        self.wallets = [PooledWallet(wallet) for wallet in wallets]
+        self.transactions = 0
+        self.resyncs = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, payments_client, prefix="NILLION_NILCHAIN_PRIVATE_KEY_"):
+        """Load NILLION_NILCHAIN_PRIVATE_KEY_0..N, stopping at the first missing index"""
+        wallets = []
+        while os.getenv(f"{prefix}{len(wallets)}"):
+            wallets.append(LocalWallet(
+                PrivateKey(bytes.fromhex(os.getenv(f"{prefix}{len(wallets)}"))),
+                prefix="nillion",
+            ))
+        return cls(payments_client, wallets)
+
+    def _acquire(self):
+        with self._lock:
+            entry = min(self.wallets, key=lambda wallet: wallet.in_flight)
+            entry.in_flight += 1
+            return entry
+
+    def _release(self, entry):
+        with self._lock:
+            entry.in_flight -= 1
+
+    def _resync(self, entry):
+        entry.account = self.payments_client.query_account(entry.wallet.address())
+
+    def _broadcast(self, entry, quotes, gas_limit, memo):
+        return nillion_config.network.broadcast(
+            self.payments_client,
+            quotes,
+            entry.address,
+            entry.wallet,
+            entry.account,
+            gas_limit,
+            memo,
+        )
+
+    def pay_quotes(self, quotes, gas_limit=1000000, memo=None):
+        """Pay for `quotes` in one transaction from the least busy wallet and return its tx hash"""
+        entry = self._acquire()
+        try:
+            with entry.lock:
+                if entry.account is None:
+                    self._resync(entry)
+                try:
+                    submitted_tx = self._broadcast(entry, quotes, gas_limit, memo)
+                except BroadcastError as e:
+                    # Another signer or a dropped transaction moved the chain's sequence; re-read it once
+                    if "sequence" not in str(e):
+                        raise
+                    with self._lock:
+                        self.resyncs += 1
+                    self._resync(entry)
+                    submitted_tx = self._broadcast(entry, quotes, gas_limit, memo)
+                entry.account.sequence += 1
+
+            # Confirmation happens outside the lock so the next payment can use the following sequence number
+            submitted_tx.wait_to_complete()
+            with self._lock:
+                self.transactions += 1
+            return submitted_tx.tx_hash
+        finally:
+            self._release(entry)
+
+    def stats(self):
+        return {
+            'wallets': len(self.wallets),
+            'in_flight': [wallet.in_flight for wallet in self.wallets],
+            'transactions': self.transactions,
+            'resyncs': self.resyncs,
+        }
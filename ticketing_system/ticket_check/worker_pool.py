@@ -0,0 +1,198 @@
+import argparse
+import asyncio
+import fcntl
+import importlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from nillion_config import private_key_count
+
+# Pipeline stage -> entry point module, and the names given to the list each main() returns
+STAGES = {
+    'issue': '01_server_initial_data_set',
+    'redeem': '02_redeem_ticket',
+    'verify': '03_multi_party_compute',
+}
+RESULT_KEYS = {
+    'issue': ('user_id', 'store_id'),
+    'redeem': ('store_id', 'party_ids_to_store_ids'),
+}
+
+_modules = {}
+_loop = None
+_key_lock = None
+
+
+def _claim_key(key_count, timeout=60.0):
+    """Index of a funded key no other live worker signs with; the lock is released when the process exits"""
+    global _key_lock
+    lock_dir = os.getenv("NILLION_KEY_LOCK_DIR", tempfile.gettempdir())
+    deadline = time.monotonic() + timeout
+    while True:
+        for index in range(key_count):
+            lock_file = open(os.path.join(lock_dir, f"nillion-key-{index}.lock"), 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            _key_lock = lock_file
+            return index
+        # A recycled worker's replacement can start before the old process has exited
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"All {key_count} funded keys are held by other workers")
+        time.sleep(0.05)
+
+
+def _init_worker(key_count):
+    """Claim a payment key, pre-import the pipeline scripts and open the event loop each job runs on"""
+    global _loop
+    # Keep the scripts' progress output off stdout, which carries results in the CLI
+    sys.stdout = sys.stderr
+    # Workers signing with one account would race on its sequence number
+    os.environ["NILLION_NILCHAIN_KEY_INDEX"] = str(_claim_key(key_count))
+    for stage, module_name in STAGES.items():
+        _modules[stage] = importlib.import_module(module_name)
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+
+
+def _warm():
+    return os.getpid()
+
+
+def _to_argv(params):
+    argv = []
+    for key, value in params.items():
+        argv.append(f"--{key}")
+        if isinstance(value, (list, tuple)):
+            argv.extend(str(item) for item in value)
+        else:
+            argv.append(str(value))
+    return argv
+
+
+def run_job(job):
+    """Run one job message on a pre-imported entry point and return a result message"""
+    stage = job['stage']
+    response = {'id': job.get('id'), 'stage': stage}
+    try:
+        value = _loop.run_until_complete(_modules[stage].main(_to_argv(job.get('params', {}))))
+        if stage in RESULT_KEYS:
+            response.update(zip(RESULT_KEYS[stage], value))
+        else:
+            response['result'] = value
+        response['status'] = 'success'
+    except SystemExit:
+        # argparse rejected the params; its usage message went to stderr
+        response['status'] = 'error'
+        response['message'] = f"Invalid params for {stage}"
+    except Exception as e:
+        response['status'] = 'error'
+        response['message'] = str(e)
+    return response
+
+
+class TicketWorkerPool:
+    """Pre-started worker processes that run the ticket pipeline scripts' main() per job"""
+
+    def __init__(self, pool_size=None, max_jobs_per_worker=100, queue_depth=None):
+        # One funded key per worker, so the default pool never outgrows the keys
+        key_count = private_key_count()
+        if pool_size and pool_size > key_count:
+            raise ValueError(
+                f"{pool_size} workers need as many NILLION_NILCHAIN_PRIVATE_KEY_<n>, found {key_count}"
+            )
+        self.pool_size = pool_size or min(os.cpu_count(), key_count)
+        if not self.pool_size:
+            raise ValueError("No NILLION_NILCHAIN_PRIVATE_KEY_0 to pay with")
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.queue_depth = queue_depth or self.pool_size * 4
+        self._slots = threading.BoundedSemaphore(self.queue_depth)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.pool_size,
+            initializer=_init_worker,
+            initargs=(key_count,),
+            max_tasks_per_child=max_jobs_per_worker,
+        )
+        # Start every worker up front so the first jobs do not pay interpreter startup
+        for future in [self._executor.submit(_warm) for _ in range(self.pool_size)]:
+            future.result()
+
+    def submit(self, job):
+        """Queue a job, blocking while queue_depth jobs are already outstanding"""
+        self._slots.acquire()
+        future = self._executor.submit(run_job, job)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def run(self, job):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The blocked acquire cannot be interrupted; hand its slot back once it gets one
+            acquiring.add_done_callback(lambda done: done.cancelled() or self._slots.release())
+            raise
+        future = self._executor.submit(run_job, job)
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(
+        description="Run JSONL ticket pipeline jobs from stdin on a pool of warm worker processes"
+    )
+    parser.add_argument(
+        "--pool_size",
+        type=int,
+        default=None,
+        help="Number of worker processes (defaults to the CPU count)",
+    )
+    parser.add_argument(
+        "--max_jobs_per_worker",
+        type=int,
+        default=100,
+        help="Jobs a worker runs before it is replaced by a fresh process",
+    )
+    parser.add_argument(
+        "--queue_depth",
+        type=int,
+        default=None,
+        help="Maximum number of jobs outstanding at once (defaults to 4x the pool size)",
+    )
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    parsed_args = parse_args(args)
+    pool = TicketWorkerPool(
+        pool_size=parsed_args.pool_size,
+        max_jobs_per_worker=parsed_args.max_jobs_per_worker,
+        queue_depth=parsed_args.queue_depth,
+    )
+    output_lock = threading.Lock()
+
+    def write_result(future):
+        with output_lock:
+            print(json.dumps(future.result()), flush=True)
+
+    # Each input line is a job such as
+    # {"id": 1, "stage": "issue", "params": {"ticket_id": 7, "ticket_owner": 90, "is_redeemed": 0}}
+    for line in sys.stdin:
+        if line.strip():
+            pool.submit(json.loads(line)).add_done_callback(write_result)
+
+    pool.close()
+
+
+if __name__ == "__main__":
+    main()